@@ -1,10 +1,14 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
 import logging
 import os
-from typing import AsyncGenerator
+import time
+from typing import AsyncIterator
 
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import (
-    AsyncConnection,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
@@ -15,6 +19,13 @@ from sqlalchemy.orm import declarative_base
 Base = declarative_base()
 
 
+class DatabaseNotInitializedError(Exception):
+    """Raised when the database is used before initialize()"""
+
+    def __init__(self):
+        super().__init__("Database not initialized")
+
+
 class DatabaseManager:
     """
     Database manager for the application
@@ -25,13 +36,43 @@ class DatabaseManager:
         self.database_url = os.getenv(
             "DATABASE_URL", "postgresql+asyncpg://evuser:evpass@db:5432/evcs"
         )
+        # Pool sized for many charge points sending small, frequent transactions
+        self.pool_size = int(os.getenv("DB_POOL_SIZE", "25"))
+        self.max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "50"))
+        self.pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+        # PgBouncer (transaction pooling) cannot share asyncpg prepared statements
+        self.use_pgbouncer = os.getenv("DB_PGBOUNCER", "0") == "1"
+        # Health check result is reused for this many seconds
+        self.health_check_ttl = float(os.getenv("DB_HEALTH_CHECK_TTL", "5"))
+        self._last_check: tuple[float, dict] | None = None
+        self._check_lock = asyncio.Lock()
         self.engine = None
         self.session_factory = None
 
+    def _engine_options(self) -> dict:
+        """Keyword arguments for create_async_engine"""
+        options = {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_pre_ping": True,
+            "pool_recycle": self.pool_recycle,
+            "pool_use_lifo": True,
+            # Room for every statement shape the API and OCPP server render
+            "query_cache_size": 1200,
+        }
+        if self.use_pgbouncer:
+            options["connect_args"] = {
+                "server_settings": {"jit": "off"},
+                "statement_cache_size": 0,
+            }
+        return options
+
     async def initialize(self):
         """Initialize database connection and create tables"""
         try:
-            self.engine = create_async_engine(self.database_url)
+            self.engine = create_async_engine(
+                self.database_url, **self._engine_options()
+            )
 
             self.session_factory = async_sessionmaker(
                 bind=self.engine, expire_on_commit=False
@@ -40,7 +81,45 @@ class DatabaseManager:
             logging.exception("Failed to initialize database")
             raise e from e
 
+    def _cached_health_check(self) -> dict | None:
+        """Get the last health check result if it is still fresh"""
+        if self._last_check is None:
+            return None
+        checked_at, result = self._last_check
+        if time.monotonic() - checked_at < self.health_check_ttl:
+            return result
+        return None
+
+    async def warm_up(self, connections: int | None = None):
+        """Open pool connections in parallel ahead of the first requests"""
+        if not self.engine:
+            raise DatabaseNotInitializedError
+
+        async def connect():
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        count = self.pool_size if connections is None else connections
+        await asyncio.gather(*(connect() for _ in range(count)))
+
     async def health_check(self) -> dict:
+        """Health check cached for health_check_ttl seconds
+
+        Probes hitting the health endpoint would otherwise take a pooled
+        connection each; concurrent callers share a single refresh.
+        """
+        result = self._cached_health_check()
+        if result is not None:
+            return result
+
+        async with self._check_lock:
+            result = self._cached_health_check()
+            if result is None:
+                result = await self._run_health_check()
+                self._last_check = (time.monotonic(), result)
+            return result
+
+    async def _run_health_check(self) -> dict:
         """Simple health check"""
         try:
             if not self.engine:
@@ -61,10 +140,11 @@ class DatabaseManager:
                 "message": f"Database connection failed: {e!s}",
             }
 
-    async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
-        """Get database session for ORM operations"""
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """Get database session for ORM operations, rolled back on error"""
         if not self.session_factory:
-            raise Exception("Database not initialized")
+            raise DatabaseNotInitializedError
 
         async with self.session_factory() as session:
             try:
@@ -79,6 +159,7 @@ class DatabaseManager:
             await self.engine.dispose()
         self.engine = None
         self.session_factory = None
+        self._last_check = None
 
     async def create_all(self, engine):
         async with engine.begin() as conn:
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import orjson
+
+
+class HealthInterceptor:
+    """
+    ASGI wrapper answering GET and HEAD /health before the FastAPI middleware stack
+    and routing run. The JSON body is rendered from `render` at most once
+    every `ttl` seconds and served pre-serialized in between.
+    """
+
+    def __init__(
+        self,
+        app,
+        render: Callable[[], Awaitable[dict]],
+        path: str = "/health",
+        ttl: float = 1.0,
+    ):
+        self.app = app
+        self.render = render
+        self.path = path
+        self.ttl = ttl
+        self._body: bytes | None = None
+        self._rendered_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        if method not in ("GET", "HEAD"):
+            await self._send(
+                send, 405, b'{"detail":"Method Not Allowed"}', not_allowed=True
+            )
+            return
+
+        # HEAD (e.g. load balancer probes) gets the GET headers without a body
+        await self._send(send, 200, await self._get_body(), head=method == "HEAD")
+
+    async def _get_body(self) -> bytes:
+        """Get the serialized health response, re-rendering it when stale"""
+        if self._is_fresh():
+            return self._body
+
+        async with self._lock:
+            if not self._is_fresh():
+                self._body = orjson.dumps(await self.render())
+                self._rendered_at = time.monotonic()
+            return self._body
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._body is not None and time.monotonic() - self._rendered_at < self.ttl
+        )
+
+    @staticmethod
+    async def _send(
+        send, status: int, body: bytes, not_allowed: bool = False, head: bool = False
+    ):
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        if not_allowed:
+            headers.append((b"allow", b"GET, HEAD"))
+        await send(
+            {"type": "http.response.start", "status": status, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": b"" if head else body})
@@ -1,26 +1,45 @@
 from __future__ import annotations
 
 from contextlib import asynccontextmanager
+from functools import lru_cache
 import logging
+import os
+from typing import TYPE_CHECKING, AsyncIterator
 
-from fastapi import Depends, FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi.responses import HTMLResponse, Response
+import orjson
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import db_manager
+from app.health_interceptor import HealthInterceptor
+from app.models import ChargingSession, ChargingStation, OCPPMessage
 from app.ocpp_server import (
     get_active_charge_points,
     get_charge_point,
     start_ocpp_server,
+    station_change_listeners,
+    stop_ocpp_server,
 )
 from app.pydantic_models import (
+    CHARGER_PAGE_ADAPTER,
+    STATION_MESSAGES_ADAPTER,
+    TRANSACTION_PAGE_ADAPTER,
     ChargerResponse,
     ConfigurationRequest,
+    OCPPMessageResponse,
+    Page,
     RemoteStartRequest,
     RemoteStopRequest,
+    StationMessagesResponse,
     TransactionResponse,
 )
+from app.response_cache import ResponseCache
+from app.static_files import CachedStaticFiles
+
+if TYPE_CHECKING:
+    from pydantic import TypeAdapter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -29,10 +48,62 @@ logger = logging.getLogger(__name__)
 # Global variable to store OCPP server
 ocpp_server = None
 
+INDEX_HTML_PATH = "app/static/index.html"
+
+# Rows per page of the list endpoints
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Dashboard polling within this many seconds is served the same response.
+# Cleared when a station boots, disconnects or reports a connector status;
+# heartbeat times may lag by up to the TTL
+API_CACHE_TTL = float(os.getenv("API_CACHE_TTL", "3"))
+chargers_cache = ResponseCache(API_CACHE_TTL)
+active_chargers_cache = ResponseCache(API_CACHE_TTL)
+
+
+def clear_station_caches():
+    """Drop cached responses built from the charging stations"""
+    chargers_cache.clear()
+    active_chargers_cache.clear()
+
+
+station_change_listeners.append(clear_station_caches)
+
+
+def json_response(adapter: TypeAdapter, content) -> Response:
+    """Serialize trusted response models straight to JSON bytes"""
+    return Response(adapter.dump_json(content), media_type="application/json")
+
+
+def decode_cursor(cursor: str | None) -> int | None:
+    """Get the row id a page cursor continues from"""
+    if cursor is None:
+        return None
+    try:
+        return int(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+
+def split_page(rows: list, limit: int) -> tuple[list, str | None]:
+    """Trim rows fetched with limit + 1 to a page and get the next page cursor"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, str(rows[-1].id)
+
+
+@lru_cache(maxsize=1)
+def get_index_html() -> bytes:
+    """Frontend page, read from disk once and kept in memory"""
+    with open(INDEX_HTML_PATH, "rb") as f:
+        return f.read()
 
-async def get_db_session() -> AsyncSession:
+
+async def get_db_session() -> AsyncIterator[AsyncSession]:
     """FastAPI dependency for database sessions"""
-    async for session in db_manager.get_session():
+    async with db_manager.session() as session:
         yield session
 
 
@@ -42,12 +113,18 @@ async def lifespan(app: FastAPI):
 
     try:
         await db_manager.initialize()
-        await db_manager.create_all(db_manager.engine)
+        # Tables are created offline (scripts/create_tables.py); dev opts in here
+        if os.getenv("DB_BOOTSTRAP") == "1":
+            await db_manager.create_all(db_manager.engine)
+        await db_manager.warm_up()
         logger.info("Database initialized")
 
         ocpp_server = await start_ocpp_server("0.0.0.0", 9000)  # nosec
         logger.info("OCPP server started")
 
+        # Load the frontend page now rather than on the first request
+        get_index_html()
+
     except Exception as e:
         logger.exception(f"Failed to startup the Application: {e}")
         raise
@@ -56,23 +133,19 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     if ocpp_server:
-        ocpp_server.close()
-        await ocpp_server.wait_closed()
+        await stop_ocpp_server(ocpp_server)
     await db_manager.close()
 
 
-app = FastAPI(
+fastapi_app = FastAPI(
     title="OCPP Module Nexus Analyica",
     description="Electric Vehicle Charger Management System",
     version="1.0.0",
     lifespan=lifespan,
 )
 
-# Handle static files
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
-
-@app.get("/health")
+@fastapi_app.get("/health")
 async def health() -> dict:
     """Health check endpoint for app and ocpp server"""
     health_status = {"status": "healthy", "services": {}}
@@ -89,54 +162,82 @@ async def health() -> dict:
     return health_status
 
 
-@app.get("/chargers", response_model=list[ChargerResponse])
+@fastapi_app.get("/chargers", response_model=Page[ChargerResponse])
 async def get_chargers(
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
     session: AsyncSession = Depends(get_db_session),
-) -> list[ChargerResponse]:
-    """Get all charging stations with their status"""
-    from sqlalchemy import select
-
-    from app.models import ChargingStation
-
-    result = await session.execute(select(ChargingStation))
-    stations = result.scalars().all()
-
-    return [
-        ChargerResponse(
+) -> Response:
+    """Get a page of charging stations with their status"""
+    cached = chargers_cache.get((limit, cursor))
+    if cached is not None:
+        return Response(cached, media_type="application/json")
+
+    # Project only the response columns: no ORM instances or identity map
+    query = select(
+        ChargingStation.id,
+        ChargingStation.station_id,
+        ChargingStation.name,
+        ChargingStation.location,
+        ChargingStation.is_online,
+        ChargingStation.last_heartbeat,
+        ChargingStation.created_at,
+    )
+    after_id = decode_cursor(cursor)
+    if after_id is not None:
+        query = query.where(ChargingStation.id > after_id)
+    result = await session.execute(query.order_by(ChargingStation.id).limit(limit + 1))
+    stations, next_cursor = split_page(result.all(), limit)
+
+    # Rows are already typed by the database: build models without validation
+    chargers = [
+        ChargerResponse.model_construct(
             id=station.station_id,
             name=station.name,
             location=station.location,
             is_online=station.is_online,
-            last_heartbeat=station.last_heartbeat.isoformat()
-            if station.last_heartbeat
-            else None,
-            created_at=station.created_at.isoformat(),
+            last_heartbeat=station.last_heartbeat,
+            created_at=station.created_at,
         )
         for station in stations
     ]
+    response = json_response(
+        CHARGER_PAGE_ADAPTER,
+        Page[ChargerResponse].model_construct(items=chargers, next_cursor=next_cursor),
+    )
+    chargers_cache.set((limit, cursor), response.body)
+    return response
 
 
-@app.get("/chargers/active")
-async def get_active_chargers() -> dict:
+@fastapi_app.get("/chargers/active")
+async def get_active_chargers() -> Response:
     """Get currently active (connected) chargers"""
+    cached = active_chargers_cache.get(None)
+    if cached is not None:
+        return Response(cached, media_type="application/json")
+
     active_chargers = get_active_charge_points()
 
-    return {
+    # orjson encodes the datetimes and int connector ids itself, in one C pass
+    content = {
         "active_chargers": list(active_chargers.keys()),
         "count": len(active_chargers),
         "chargers": [
             {
                 "station_id": cp.station_id,
                 "is_online": cp.is_online,
-                "last_heartbeat": cp.last_heartbeat.isoformat(),
+                "last_heartbeat": cp.last_heartbeat,
                 "connector_status": cp.connector_status,
             }
             for cp in active_chargers.values()
         ],
     }
+    body = orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    active_chargers_cache.set(None, body)
+    return Response(body, media_type="application/json")
 
 
-@app.post("/chargers/{charger_id}/start")
+@fastapi_app.post("/chargers/{charger_id}/start")
 async def start_charging(charger_id: str, request: RemoteStartRequest) -> dict:
     """Send remote start transaction to a charger"""
     charge_point = get_charge_point(charger_id)
@@ -162,7 +263,7 @@ async def start_charging(charger_id: str, request: RemoteStartRequest) -> dict:
         }
 
 
-@app.post("/chargers/{charger_id}/stop")
+@fastapi_app.post("/chargers/{charger_id}/stop")
 async def stop_charging(charger_id: str, request: RemoteStopRequest) -> dict:
     """Send remote stop transaction to a charger"""
     charge_point = get_charge_point(charger_id)
@@ -188,7 +289,7 @@ async def stop_charging(charger_id: str, request: RemoteStopRequest) -> dict:
         }
 
 
-@app.post("/chargers/{charger_id}/configure")
+@fastapi_app.post("/chargers/{charger_id}/configure")
 async def configure_charger(charger_id: str, request: ConfigurationRequest) -> dict:
     """Send configuration change to a charger"""
     charge_point = get_charge_point(charger_id)
@@ -214,104 +315,118 @@ async def configure_charger(charger_id: str, request: ConfigurationRequest) -> d
         }
 
 
-@app.get("/transactions", response_model=list[TransactionResponse])
-async def get_transactions(
-    session: AsyncSession = Depends(get_db_session),
-) -> list[TransactionResponse]:
-    """Get all charging transactions"""
-    from sqlalchemy import select
-
-    from app.models import ChargingSession
-
-    result = await session.execute(select(ChargingSession))
-    transactions = result.scalars().all()
+async def get_transactions_page(
+    session: AsyncSession,
+    limit: int,
+    cursor: str | None,
+    station_id: str | None = None,
+) -> Response:
+    """Get a page of charging transactions, newest first"""
+    query = select(
+        ChargingSession.id,
+        ChargingSession.session_id,
+        ChargingSession.station_id,
+        ChargingSession.status,
+        ChargingSession.energy_delivered,
+        ChargingSession.start_time,
+        ChargingSession.end_time,
+        ChargingSession.created_at,
+    )
+    if station_id is not None:
+        query = query.where(ChargingSession.station_id == station_id)
+    before_id = decode_cursor(cursor)
+    if before_id is not None:
+        query = query.where(ChargingSession.id < before_id)
+    result = await session.execute(
+        query.order_by(ChargingSession.id.desc()).limit(limit + 1)
+    )
+    transactions, next_cursor = split_page(result.all(), limit)
 
-    return [
-        TransactionResponse(
+    items: list[TransactionResponse] = [
+        TransactionResponse.model_construct(
             id=tx.id,
             session_id=tx.session_id,
             station_id=tx.station_id,
             status=tx.status,
             energy_delivered=tx.energy_delivered,
-            start_time=tx.start_time.isoformat() if tx.start_time else None,
-            end_time=tx.end_time.isoformat() if tx.end_time else None,
-            created_at=tx.created_at.isoformat(),
+            start_time=tx.start_time,
+            end_time=tx.end_time,
+            created_at=tx.created_at,
         )
         for tx in transactions
     ]
+    return json_response(
+        TRANSACTION_PAGE_ADAPTER,
+        Page[TransactionResponse].model_construct(items=items, next_cursor=next_cursor),
+    )
 
 
-@app.get("/transactions/{station_id}")
-async def get_station_transactions(
-    station_id: str, session: AsyncSession = Depends(get_db_session)
-) -> list[TransactionResponse]:
-    """Get transactions for a specific station"""
-    from sqlalchemy import select
-
-    from app.models import ChargingSession
+@fastapi_app.get("/transactions", response_model=Page[TransactionResponse])
+async def get_transactions(
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    session: AsyncSession = Depends(get_db_session),
+) -> Response:
+    """Get a page of charging transactions"""
+    return await get_transactions_page(session, limit, cursor)
 
-    result = await session.execute(
-        select(ChargingSession).where(ChargingSession.station_id == station_id)
-    )
-    transactions = result.scalars().all()
 
-    return [
-        TransactionResponse(
-            id=tx.id,
-            session_id=tx.session_id,
-            station_id=tx.station_id,
-            status=tx.status,
-            energy_delivered=tx.energy_delivered,
-            start_time=tx.start_time.isoformat() if tx.start_time else None,
-            end_time=tx.end_time.isoformat() if tx.end_time else None,
-            created_at=tx.created_at.isoformat(),
-        )
-        for tx in transactions
-    ]
+@fastapi_app.get("/transactions/{station_id}", response_model=Page[TransactionResponse])
+async def get_station_transactions(
+    station_id: str,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    session: AsyncSession = Depends(get_db_session),
+) -> Response:
+    """Get a page of transactions for a specific station"""
+    return await get_transactions_page(session, limit, cursor, station_id)
 
 
-@app.get("/messages/{station_id}")
+@fastapi_app.get("/messages/{station_id}", response_model=StationMessagesResponse)
 async def get_station_messages(
     station_id: str, session: AsyncSession = Depends(get_db_session)
-) -> dict:
+) -> Response:
     """Get Websocket messages for a specific station"""
-    from sqlalchemy import select
-
-    from app.models import OCPPMessage
-
     result = await session.execute(
-        select(OCPPMessage)
+        select(
+            OCPPMessage.id,
+            OCPPMessage.message_type,
+            OCPPMessage.action,
+            OCPPMessage.message_id,
+            OCPPMessage.payload,
+            OCPPMessage.timestamp,
+        )
         .where(OCPPMessage.station_id == station_id)
         .order_by(OCPPMessage.timestamp.desc())
         .limit(100)
     )
-    messages = result.scalars().all()
-
-    return {
-        "station_id": station_id,
-        "messages": [
-            {
-                "id": msg.id,
-                "message_type": msg.message_type,
-                "action": msg.action,
-                "message_id": msg.message_id,
-                "payload": msg.payload,
-                "timestamp": msg.timestamp.isoformat(),
-            }
+    messages = result.all()
+
+    response = StationMessagesResponse.model_construct(
+        station_id=station_id,
+        messages=[
+            OCPPMessageResponse.model_construct(
+                id=msg.id,
+                message_type=msg.message_type,
+                action=msg.action,
+                message_id=msg.message_id,
+                payload=msg.payload,
+                timestamp=msg.timestamp,
+            )
             for msg in messages
         ],
-        "count": len(messages),
-    }
+        count=len(messages),
+    )
+    return json_response(STATION_MESSAGES_ADAPTER, response)
 
 
-@app.get("/", response_class=HTMLResponse)
+@fastapi_app.get("/", response_class=HTMLResponse)
 async def root():
     """Serve the frontend page"""
-    with open("app/static/index.html", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read(), status_code=200)
+    return HTMLResponse(content=get_index_html(), status_code=200)
 
 
-@app.get("/api")
+@fastapi_app.get("/api")
 async def api_info():
     """API information endpoint"""
     return {
@@ -325,3 +440,10 @@ async def api_info():
             "docs": "/docs",
         },
     }
+
+
+# Answer /health and /static/* before the FastAPI stack; this is the ASGI entry point
+app = HealthInterceptor(
+    CachedStaticFiles(fastapi_app, prefix="/static", directory="app/static"),
+    health,
+)
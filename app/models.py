@@ -1,4 +1,5 @@
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, Text
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String, Text, desc
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 from app.database import Base
@@ -30,11 +31,25 @@ class ChargingStation(Base):
     last_heartbeat = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # lazy="raise": load explicitly with selectinload() instead of an N+1 per row
+    sessions = relationship(
+        "ChargingSession",
+        primaryjoin="ChargingStation.station_id == foreign(ChargingSession.station_id)",
+        back_populates="station",
+        lazy="raise",
+        viewonly=True,
+    )
+
 
 class ChargingSession(Base):
     """Charging Session model"""
 
     __tablename__ = "charging_sessions"
+    __table_args__ = (
+        # Active sessions of a station; the station_id prefix also serves
+        # the per-station transaction list
+        Index("ix_sessions_station_status", "station_id", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String(100), unique=True, index=True, nullable=False)
@@ -46,11 +61,23 @@ class ChargingSession(Base):
     end_time = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    station = relationship(
+        "ChargingStation",
+        primaryjoin="ChargingStation.station_id == foreign(ChargingSession.station_id)",
+        back_populates="sessions",
+        lazy="raise",
+        viewonly=True,
+    )
+
 
 class OCPPMessage(Base):
     """OCPP Message log"""
 
     __tablename__ = "ocpp_messages"
+    __table_args__ = (
+        # Latest messages of a station: index scan, no sort, for ORDER BY ... LIMIT
+        Index("ix_ocpp_messages_station_ts", "station_id", desc("timestamp")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     station_id = Column(String(50), nullable=False)
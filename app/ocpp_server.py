@@ -1,7 +1,12 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
 from datetime import UTC, datetime
-import json
 import logging
-from typing import Dict, Optional
+import os
+import time
+from typing import TYPE_CHECKING, Callable, Sequence
 
 from ocpp.routing import on
 from ocpp.v16 import ChargePoint as OCPPChargePoint
@@ -11,19 +16,116 @@ from ocpp.v16.enums import (
     AuthorizationStatus,
     RegistrationStatus,
 )
+import orjson
+from sqlalchemy import (
+    DateTime,
+    String,
+    bindparam,
+    column,
+    insert,
+    lambda_stmt,
+    select,
+    update,
+    values,
+)
 import websockets
 from websockets.exceptions import ConnectionClosed
-from websockets.server import WebSocketServerProtocol
 
-from app.database import db_manager
+from app.database import DatabaseNotInitializedError, db_manager
 from app.models import ChargingSession, ChargingStation, OCPPMessage
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from websockets.server import WebSocketServerProtocol
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Global dictionary to store active charge points
-active_charge_points: Dict[str, "ChargePoint"] = {}
+active_charge_points: dict[str, ChargePoint] = {}
+# Close handshakes of replaced connections, referenced until they finish
+_closing_tasks: set[asyncio.Task] = set()
+
+# Writes buffered between two runs of the background flusher
+FLUSH_INTERVAL = float(os.getenv("OCPP_FLUSH_INTERVAL", "1"))
+pending_messages: asyncio.Queue[dict] = asyncio.Queue()
+pending_heartbeats: dict[str, datetime] = {}
+_flusher_task: asyncio.Task | None = None
+# Batches at least this large are written with COPY instead of INSERT
+COPY_THRESHOLD = 50
+OCPP_MESSAGE_COLUMNS = (
+    "station_id",
+    "message_type",
+    "action",
+    "message_id",
+    "payload",
+    "timestamp",
+)
+
+# OCPP frames are small JSON texts: per-message deflate costs more CPU than it saves
+OCPP_SUBPROTOCOL = "ocpp1.6"
+# Largest incoming frame accepted; batched MeterValues or DataTransfer can be big
+MAX_FRAME_SIZE = int(os.getenv("OCPP_MAX_FRAME_SIZE", str(2**20)))
+# Outgoing bytes buffered before send() waits for the socket to drain
+WRITE_LIMIT = 2**16
+
+# Called after a station registers, goes offline or reports a connector status,
+# e.g. to drop cached API responses
+station_change_listeners: list[Callable[[], None]] = []
+
+# Station IDs allowed to connect, reloaded from the database once they go stale
+REGISTERED_REFRESH_INTERVAL = float(os.getenv("OCPP_REGISTERED_REFRESH", "60"))
+registered_station_ids: set[str] = set()
+_registered_refreshed_at: float | None = None
+
+# Hot-path statements, cached by SQLAlchemy so they are compiled only once
+STATION_LOOKUP_STMT = lambda_stmt(
+    lambda: select(ChargingStation).where(
+        ChargingStation.station_id == bindparam("station_id")
+    )
+)
+STATION_EXISTS_STMT = lambda_stmt(
+    lambda: (
+        select(ChargingStation.id)
+        .where(ChargingStation.station_id == bindparam("station_id"))
+        .limit(1)
+    )
+)
+STATION_OFFLINE_STMT = lambda_stmt(
+    lambda: (
+        update(ChargingStation)
+        .where(ChargingStation.station_id == bindparam("station"))
+        .values(is_online=False)
+    )
+)
+STOP_SESSION_STMT = lambda_stmt(
+    lambda: (
+        update(ChargingSession)
+        .where(ChargingSession.id == bindparam("session_pk"))
+        .values(
+            status="completed",
+            end_time=bindparam("end_time"),
+            energy_delivered=bindparam("meter_stop"),
+        )
+    )
+)
+STOP_ACTIVE_SESSIONS_STMT = lambda_stmt(
+    lambda: (
+        update(ChargingSession)
+        .where(
+            # "station_id" is reserved for the SET clause of an UPDATE
+            (ChargingSession.station_id == bindparam("station"))
+            & (ChargingSession.status == "active")
+            & ChargingSession.session_id.like(bindparam("session_suffix"), escape="\\")
+        )
+        .values(
+            status="completed",
+            end_time=bindparam("end_time"),
+            energy_delivered=bindparam("meter_stop"),
+        )
+    )
+)
 
 
 class ChargePoint(OCPPChargePoint):
@@ -35,6 +137,24 @@ class ChargePoint(OCPPChargePoint):
         self.is_online = True
         self.last_heartbeat = datetime.now(UTC)
         self.connector_status = {}
+        # Database session reused by every handler of this connection
+        self._session: AsyncSession | None = None
+        # Open transactions: OCPP transaction id -> ChargingSession.id
+        self._active_sessions: dict[int, int] = {}
+
+    def _db_session(self) -> AsyncSession:
+        """Get the database session of this connection, opening it on first use"""
+        if self._session is None:
+            if not db_manager.session_factory:
+                raise DatabaseNotInitializedError
+            self._session = db_manager.session_factory()
+        return self._session
+
+    async def _close_db_session(self):
+        """Release the connection's database session back to the pool"""
+        if self._session is not None:
+            session, self._session = self._session, None
+            await session.close()
 
     async def start(self):
         """Start the charge point connection"""
@@ -50,31 +170,24 @@ class ChargePoint(OCPPChargePoint):
     async def _handle_disconnection(self):
         """Handle charge point disconnection"""
         self.is_online = False
+        unregister_charge_point(self)
         if self.station_id in active_charge_points:
-            del active_charge_points[self.station_id]
-
-        # Update database
-        async for session in db_manager.get_session():
-            try:
-                from sqlalchemy import select, update
+            # A newer connection for this station owns it now
+            await self._close_db_session()
+            return
 
-                result = await session.execute(
-                    select(ChargingStation).where(
-                        ChargingStation.station_id == self.station_id
-                    )
+        # Update database; an unknown station simply matches no row
+        try:
+            session = self._db_session()
+            async with session.begin():
+                await session.execute(
+                    STATION_OFFLINE_STMT, {"station": self.station_id}
                 )
-                station = result.scalar_one_or_none()
-                if station:
-                    await session.execute(
-                        update(ChargingStation)
-                        .where(ChargingStation.station_id == self.station_id)
-                        .values(is_online=False)
-                    )
-                    await session.commit()
-            except Exception as e:
-                logger.error(f"Error updating station status: {e}")
-            finally:
-                await session.close()
+        except Exception as e:
+            logger.error(f"Error updating station status: {e}")
+        finally:
+            await self._close_db_session()
+        _notify_station_change()
 
     async def send_remote_start_transaction(self, id_tag: str, connector_id: int = 1):
         """Send remote start transaction to charge point"""
@@ -123,22 +236,21 @@ class ChargePoint(OCPPChargePoint):
         # Log the message
         await self._log_ocpp_message("BootNotification", "BootNotification", kwargs)
 
-        # Update or create charging station in database
-        async for session in db_manager.get_session():
-            try:
-                from sqlalchemy import select
+        now = datetime.now(UTC)
 
+        # Update or create charging station in database
+        try:
+            session = self._db_session()
+            async with session.begin():
                 result = await session.execute(
-                    select(ChargingStation).where(
-                        ChargingStation.station_id == self.station_id
-                    )
+                    STATION_LOOKUP_STMT, {"station_id": self.station_id}
                 )
                 station = result.scalar_one_or_none()
 
                 if station:
                     # Update existing station
                     station.is_online = True
-                    station.last_heartbeat = datetime.now(UTC)
+                    station.last_heartbeat = now
                 else:
                     # Create new station
                     station = ChargingStation(
@@ -146,23 +258,21 @@ class ChargePoint(OCPPChargePoint):
                         name=f"{charge_point_vendor} {charge_point_model}",
                         location="Unknown",
                         is_online=True,
-                        last_heartbeat=datetime.now(UTC),
+                        last_heartbeat=now,
                     )
                     session.add(station)
 
-                await session.commit()
-                await session.refresh(station)
+                await session.flush()
 
-            except Exception as e:
-                logger.error(f"Error handling boot notification: {e}")
-            finally:
-                await session.close()
+        except Exception as e:
+            logger.error(f"Error handling boot notification: {e}")
 
-        # Add to active charge points
-        active_charge_points[self.station_id] = self
+        # Add to active charge points, unless a newer connection replaced this one
+        active_charge_points.setdefault(self.station_id, self)
+        _notify_station_change()
 
         return call_result.BootNotificationPayload(
-            current_time=datetime.now(UTC).isoformat() + "Z",
+            current_time=now.isoformat() + "Z",
             interval=300,  # 5 minutes heartbeat interval
             status=RegistrationStatus.accepted,
         )
@@ -170,31 +280,17 @@ class ChargePoint(OCPPChargePoint):
     @on(Action.Heartbeat)
     async def on_heartbeat(self, **kwargs):
         """Handle Heartbeat from charge point"""
-        self.last_heartbeat = datetime.now(UTC)
+        now = datetime.now(UTC)
+        self.last_heartbeat = now
         logger.debug(f"Heartbeat from {self.station_id}")
 
         # Log the message
         await self._log_ocpp_message("Heartbeat", "Heartbeat", kwargs)
 
-        # Update heartbeat in database
-        async for session in db_manager.get_session():
-            try:
-                from sqlalchemy import update
+        # Heartbeat is written to the database by the flusher
+        pending_heartbeats[self.station_id] = now
 
-                await session.execute(
-                    update(ChargingStation)
-                    .where(ChargingStation.station_id == self.station_id)
-                    .values(last_heartbeat=datetime.now(UTC))
-                )
-                await session.commit()
-            except Exception as e:
-                logger.error(f"Error updating heartbeat: {e}")
-            finally:
-                await session.close()
-
-        return call_result.HeartbeatPayload(
-            current_time=datetime.now(UTC).isoformat() + "Z"
-        )
+        return call_result.HeartbeatPayload(current_time=now.isoformat() + "Z")
 
     @on(Action.StatusNotification)
     async def on_status_notification(
@@ -211,6 +307,7 @@ class ChargePoint(OCPPChargePoint):
             "error_code": error_code,
             "timestamp": datetime.now(UTC),
         }
+        _notify_station_change()
 
         # Log the message
         await self._log_ocpp_message("StatusNotification", "StatusNotification", kwargs)
@@ -230,31 +327,30 @@ class ChargePoint(OCPPChargePoint):
         await self._log_ocpp_message("StartTransaction", "StartTransaction", kwargs)
 
         # Create charging session
-        session_id = (
-            f"{self.station_id}_{connector_id}_{int(datetime.now(UTC).timestamp())}"
-        )
+        now = datetime.now(UTC)
+        transaction_id = int(now.timestamp())
+        session_id = f"{self.station_id}_{connector_id}_{transaction_id}"
 
-        async for session in db_manager.get_session():
-            try:
+        try:
+            session = self._db_session()
+            async with session.begin():
                 charging_session = ChargingSession(
                     session_id=session_id,
                     station_id=self.station_id,
                     status="active",
-                    start_time=datetime.now(UTC),
+                    start_time=now,
                 )
                 session.add(charging_session)
-                await session.commit()
-                await session.refresh(charging_session)
+                await session.flush()
 
-                logger.info(f"Created charging session: {session_id}")
+            self._active_sessions[transaction_id] = charging_session.id
+            logger.info(f"Created charging session: {session_id}")
 
-            except Exception as e:
-                logger.error(f"Error creating charging session: {e}")
-            finally:
-                await session.close()
+        except Exception as e:
+            logger.error(f"Error creating charging session: {e}")
 
         return call_result.StartTransactionPayload(
-            transaction_id=int(datetime.now(UTC).timestamp()),
+            transaction_id=transaction_id,
             id_tag_info={"status": AuthorizationStatus.accepted},
         )
 
@@ -271,25 +367,25 @@ class ChargePoint(OCPPChargePoint):
         await self._log_ocpp_message("StopTransaction", "StopTransaction", kwargs)
 
         # Update charging session
-        async for session in db_manager.get_session():
-            try:
-                from sqlalchemy import update
-
-                await session.execute(
-                    update(ChargingSession)
-                    .where(ChargingSession.session_id.like(f"%{self.station_id}%"))
-                    .values(
-                        status="completed",
-                        end_time=datetime.now(UTC),
-                        energy_delivered=meter_stop,
-                    )
-                )
-                await session.commit()
+        try:
+            params = {"end_time": datetime.now(UTC), "meter_stop": meter_stop}
+            session_pk = self._active_sessions.pop(transaction_id, None)
+            if session_pk is not None:
+                stmt = STOP_SESSION_STMT
+                params["session_pk"] = session_pk
+            else:
+                # Started before this connection (e.g. server restart): match
+                # the "{station}_{connector}_{transaction}" session_id suffix
+                stmt = STOP_ACTIVE_SESSIONS_STMT
+                params["station"] = self.station_id
+                params["session_suffix"] = f"%\\_{transaction_id}"
+
+            session = self._db_session()
+            async with session.begin():
+                await session.execute(stmt, params)
 
-            except Exception as e:
-                logger.error(f"Error updating charging session: {e}")
-            finally:
-                await session.close()
+        except Exception as e:
+            logger.error(f"Error updating charging session: {e}")
 
         return call_result.StopTransactionPayload()
 
@@ -306,25 +402,123 @@ class ChargePoint(OCPPChargePoint):
         )
 
     async def _log_ocpp_message(self, message_type: str, action: str, payload: dict):
-        """Log OCPP message to database"""
+        """Queue OCPP message to be logged to database by the flusher"""
         try:
-            async for session in db_manager.get_session():
-                try:
-                    ocpp_message = OCPPMessage(
-                        station_id=self.station_id,
-                        message_type=message_type,
-                        action=action,
-                        message_id=str(int(datetime.now(UTC).timestamp())),
-                        payload=json.dumps(payload),
-                    )
-                    session.add(ocpp_message)
-                    await session.commit()
-                except Exception as e:
-                    logger.error(f"Error logging OCPP message: {e}")
-                finally:
-                    await session.close()
+            now = datetime.now(UTC)
+            pending_messages.put_nowait(
+                {
+                    "station_id": self.station_id,
+                    "message_type": message_type,
+                    "action": action,
+                    "message_id": str(int(now.timestamp())),
+                    "payload": orjson.dumps(payload).decode(),
+                    "timestamp": now,
+                }
+            )
         except Exception as e:
-            logger.error(f"Error in message logging: {e}")
+            logger.error(f"Error logging OCPP message: {e}")
+
+
+async def _insert_messages(session: AsyncSession, messages: list):
+    """Insert queued OCPP messages, using COPY for large batches on asyncpg
+
+    COPY bypasses SQLAlchemy, so it only joins the session's transaction if a
+    statement has already been executed on it.
+    """
+    if len(messages) >= COPY_THRESHOLD:
+        conn = await session.connection()
+        if conn.dialect.driver == "asyncpg":
+            raw_connection = await conn.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                OCPPMessage.__tablename__,
+                records=[
+                    tuple(message[name] for name in OCPP_MESSAGE_COLUMNS)
+                    for message in messages
+                ],
+                columns=OCPP_MESSAGE_COLUMNS,
+            )
+            return
+
+    # executemany, batched by SQLAlchemy into multi-row INSERTs
+    await session.execute(insert(OCPPMessage), messages)
+
+
+async def flush_pending_writes():
+    """Write queued OCPP messages and heartbeats to database in one transaction"""
+    messages = []
+    while not pending_messages.empty():
+        messages.append(pending_messages.get_nowait())
+    heartbeats = list(pending_heartbeats.items())
+    pending_heartbeats.clear()
+
+    if not messages and not heartbeats:
+        return
+
+    try:
+        async with db_manager.session() as session:
+            # The UPDATE goes first: asyncpg only opens the transaction on the
+            # first execute, so a COPY sent before it would run in autocommit
+            if heartbeats:
+                # UPDATE ... FROM (VALUES ...) updates every station at once
+                beats = values(
+                    column("station_id", String),
+                    column("last_heartbeat", DateTime(timezone=True)),
+                    name="beats",
+                ).data(heartbeats)
+                await session.execute(
+                    update(ChargingStation)
+                    .where(ChargingStation.station_id == beats.c.station_id)
+                    .values(last_heartbeat=beats.c.last_heartbeat)
+                    .execution_options(synchronize_session=False)
+                )
+
+            if messages:
+                await _insert_messages(session, messages)
+
+            await session.commit()
+    except Exception as e:
+        logger.error(
+            f"Error flushing {len(messages)} messages and "
+            f"{len(heartbeats)} heartbeats: {e}"
+        )
+
+
+async def _run_flusher():
+    """Periodically flush buffered writes until cancelled"""
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        try:
+            await flush_pending_writes()
+        except Exception:
+            logger.exception("Error in background flusher")
+
+
+async def is_registered_station(station_id: str) -> bool:
+    """Check a station is registered, hitting the database only on a cache miss"""
+    global _registered_refreshed_at  # noqa: PLW0603
+
+    now = time.monotonic()
+    stale = (
+        _registered_refreshed_at is None
+        or now - _registered_refreshed_at > REGISTERED_REFRESH_INTERVAL
+    )
+    if not stale and station_id in registered_station_ids:
+        return True
+
+    async with db_manager.session() as session:
+        if stale:
+            result = await session.execute(select(ChargingStation.station_id))
+            registered_station_ids.clear()
+            registered_station_ids.update(result.scalars().all())
+            _registered_refreshed_at = now
+            return station_id in registered_station_ids
+
+        # Registered since the last refresh
+        result = await session.execute(STATION_EXISTS_STMT, {"station_id": station_id})
+        if result.scalar() is None:
+            return False
+        registered_station_ids.add(station_id)
+        return True
 
 
 async def on_connect(websocket: WebSocketServerProtocol):
@@ -338,41 +532,29 @@ async def on_connect(websocket: WebSocketServerProtocol):
         return
 
     # Check if charger exists in database
-    async for session in db_manager.get_session():
-        try:
-            from sqlalchemy import select
-
-            result = await session.execute(
-                select(ChargingStation).where(
-                    ChargingStation.station_id == charge_point_id
-                )
-            )
-            station = result.scalar_one_or_none()
-
-            if not station:
-                logger.error(
-                    f"Charge point {charge_point_id} not found in database - rejecting connection"
-                )
-                await websocket.close(code=1008, reason="Charge point not registered")
-                return
+    try:
+        registered = await is_registered_station(charge_point_id)
+    except Exception as e:
+        logger.error(f"Error validating charge point {charge_point_id}: {e}")
+        await websocket.close(code=1011, reason="Database error")
+        return
 
-            logger.info(
-                f"Charge point {charge_point_id} validated - allowing connection"
-            )
+    if not registered:
+        logger.error(
+            f"Charge point {charge_point_id} not found in database - rejecting connection"
+        )
+        await websocket.close(code=1008, reason="Charge point not registered")
+        return
 
-        except Exception as e:
-            logger.error(f"Error validating charge point {charge_point_id}: {e}")
-            await websocket.close(code=1011, reason="Database error")
-            return
-        finally:
-            await session.close()
+    logger.info(f"Charge point {charge_point_id} validated - allowing connection")
 
+    cp = None
     try:
         # Create charge point instance
         cp = ChargePoint(charge_point_id, websocket)
 
         # Add to active charge points
-        active_charge_points[charge_point_id] = cp
+        register_charge_point(cp)
 
         # Start the charge point
         await cp.start()
@@ -380,7 +562,8 @@ async def on_connect(websocket: WebSocketServerProtocol):
     except Exception as e:
         logger.error(f"Error in charge point {charge_point_id}: {e}")
         logger.exception("Full traceback:")
-        active_charge_points.pop(charge_point_id, None)
+        if cp is not None:
+            unregister_charge_point(cp)
 
         # Try to close the websocket gracefully
         try:
@@ -389,6 +572,11 @@ async def on_connect(websocket: WebSocketServerProtocol):
             logger.exception("Error closing websocket: %s", str(e))
 
 
+def select_ocpp_subprotocol(_connection, subprotocols: Sequence[str]) -> str | None:
+    """Accept OCPP 1.6 when offered, without rejecting clients that offer nothing"""
+    return OCPP_SUBPROTOCOL if OCPP_SUBPROTOCOL in subprotocols else None
+
+
 async def start_ocpp_server(host: str = "0.0.0.0", port: int = 9000):  # nosec
     """Start the OCPP WebSocket server"""
     logger.info(f"Starting OCPP server on {host}:{port}")
@@ -400,17 +588,71 @@ async def start_ocpp_server(host: str = "0.0.0.0", port: int = 9000):  # nosec
 
         await on_connect(websocket)
 
-    server = await websockets.serve(handler, host, port)
+    server = await websockets.serve(
+        handler,
+        host,
+        port,
+        compression=None,
+        max_size=MAX_FRAME_SIZE,
+        write_limit=WRITE_LIMIT,
+        ping_interval=20,
+        ping_timeout=20,
+        select_subprotocol=select_ocpp_subprotocol,
+    )
+
+    global _flusher_task  # noqa: PLW0603
+    _flusher_task = asyncio.create_task(_run_flusher())
 
     logger.info(f"OCPP server started on {host}:{port}")
     return server
 
 
-def get_active_charge_points() -> Dict[str, ChargePoint]:
+async def stop_ocpp_server(server):
+    """Stop the OCPP WebSocket server and flush buffered writes"""
+    global _flusher_task  # noqa: PLW0603
+
+    server.close()
+    await server.wait_closed()
+
+    if _flusher_task:
+        _flusher_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _flusher_task
+        _flusher_task = None
+
+    await flush_pending_writes()
+
+
+def _notify_station_change():
+    """Run the station change listeners"""
+    for listener in station_change_listeners:
+        listener()
+
+
+def register_charge_point(cp: ChargePoint):
+    """Make cp the active charge point of its station, closing the one it replaces"""
+    previous = active_charge_points.get(cp.station_id)
+    active_charge_points[cp.station_id] = cp
+    if previous is not None and previous is not cp:
+        logger.info(
+            f"Charge point {cp.station_id} reconnected - closing old connection"
+        )
+        task = asyncio.create_task(previous._connection.close())  # noqa: SLF001
+        _closing_tasks.add(task)
+        task.add_done_callback(_closing_tasks.discard)
+
+
+def unregister_charge_point(cp: ChargePoint):
+    """Remove cp from the active charge points if it is still the registered one"""
+    if active_charge_points.get(cp.station_id) is cp:
+        del active_charge_points[cp.station_id]
+
+
+def get_active_charge_points() -> dict[str, ChargePoint]:
     """Get dictionary of active charge points"""
     return active_charge_points.copy()
 
 
-def get_charge_point(station_id: str) -> Optional[ChargePoint]:
+def get_charge_point(station_id: str) -> ChargePoint | None:
     """Get specific charge point by station ID"""
     return active_charge_points.get(station_id)
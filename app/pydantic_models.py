@@ -1,21 +1,33 @@
+from __future__ import annotations
+
+from datetime import datetime
 import logging
-from typing import Optional
+from typing import Generic, TypeVar
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+T = TypeVar("T")
+
+
 # Pydantic models for API
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    # Pass back as ?cursor= to get the next page; null on the last page
+    next_cursor: str | None
+
+
 class ChargerResponse(BaseModel):
     id: str
     name: str
-    location: Optional[str]
+    location: str | None
     is_online: bool
-    last_heartbeat: Optional[str]
-    created_at: str
+    last_heartbeat: datetime | None
+    created_at: datetime
 
 
 class TransactionResponse(BaseModel):
@@ -24,20 +36,51 @@ class TransactionResponse(BaseModel):
     station_id: str
     status: str
     energy_delivered: int
-    start_time: Optional[str]
-    end_time: Optional[str]
-    created_at: str
+    start_time: datetime | None
+    end_time: datetime | None
+    created_at: datetime
+
+
+class OCPPMessageResponse(BaseModel):
+    id: int
+    message_type: str
+    action: str
+    message_id: str
+    payload: str | None
+    timestamp: datetime
+
+
+class StationMessagesResponse(BaseModel):
+    station_id: str
+    messages: list[OCPPMessageResponse]
+    count: int
+
+
+# Serializers for list responses, built once: dump_json runs in pydantic-core
+CHARGER_PAGE_ADAPTER = TypeAdapter(Page[ChargerResponse])
+TRANSACTION_PAGE_ADAPTER = TypeAdapter(Page[TransactionResponse])
+STATION_MESSAGES_ADAPTER = TypeAdapter(StationMessagesResponse)
+
+
+# Request bodies: small, immutable, and strict about unknown fields
+REQUEST_MODEL_CONFIG = ConfigDict(extra="forbid", frozen=True)
 
 
 class RemoteStartRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     id_tag: str
     connector_id: int = 1
 
 
 class RemoteStopRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     transaction_id: int
 
 
 class ConfigurationRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     key: str
     value: str
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import time
+from typing import Hashable
+
+
+class ResponseCache:
+    """
+    Serialized response bodies kept for `ttl` seconds, so bursts of
+    dashboard polling are answered without rebuilding the response.
+    Holds at most `maxsize` keys; it is emptied when that is exceeded.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 128):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: dict[Hashable, tuple[float, bytes]] = {}
+
+    def get(self, key: Hashable) -> bytes | None:
+        """Get the body stored under key, unless it has expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, body = entry
+        if time.monotonic() - stored_at >= self.ttl:
+            del self._entries[key]
+            return None
+        return body
+
+    def set(self, key: Hashable, body: bytes):
+        if key not in self._entries and len(self._entries) >= self.maxsize:
+            self._entries.clear()
+        self._entries[key] = (time.monotonic(), body)
+
+    def clear(self):
+        self._entries.clear()
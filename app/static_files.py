@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+from pathlib import Path
+
+
+class CachedStaticFiles:
+    """
+    ASGI wrapper serving a small static directory from memory.
+    Files under `directory` are read once, when the wrapper is built, and
+    requests under `prefix` are answered with one dict lookup instead of a
+    stat/open/read per request. Other paths are passed to the wrapped app.
+    """
+
+    def __init__(
+        self,
+        app,
+        prefix: str = "/static",
+        directory: str = "app/static",
+        cache_control: str = "public, max-age=3600",
+    ):
+        self.app = app
+        self.prefix = prefix.rstrip("/") + "/"
+        self.cache_control = cache_control.encode()
+        self.files = self._load(Path(directory))
+
+    def _load(self, directory: Path) -> dict[str, tuple[bytes, bytes, bytes]]:
+        """Map request path -> (body, content type, etag)"""
+        files = {}
+        for path in sorted(directory.rglob("*")):
+            if not path.is_file():
+                continue
+            body = path.read_bytes()
+            content_type = mimetypes.guess_type(path.name)[0]
+            if content_type is None:
+                content_type = "application/octet-stream"
+            elif content_type.startswith("text/"):
+                content_type += "; charset=utf-8"
+            etag = hashlib.md5(body, usedforsecurity=False).hexdigest()
+            files[self.prefix + path.relative_to(directory).as_posix()] = (
+                body,
+                content_type.encode(),
+                f'"{etag}"'.encode(),
+            )
+        return files
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        cached = self.files.get(scope["path"])
+        if cached is None:
+            await self._send(send, 404, b"Not Found", [])
+            return
+        if scope["method"] not in ("GET", "HEAD"):
+            await self._send(send, 405, b"Method Not Allowed", [(b"allow", b"GET")])
+            return
+
+        body, content_type, etag = cached
+        headers = [
+            (b"content-type", content_type),
+            (b"etag", etag),
+            (b"cache-control", self.cache_control),
+        ]
+        if etag in self._if_none_match(scope):
+            await self._send(send, 304, b"", headers, content_length=False)
+        elif scope["method"] == "HEAD":
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [*headers, (b"content-length", b"%d" % len(body))],
+                }
+            )
+            await send({"type": "http.response.body", "body": b""})
+        else:
+            await self._send(send, 200, body, headers)
+
+    @staticmethod
+    def _if_none_match(scope) -> list:
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                return [tag.strip() for tag in value.split(b",")]
+        return []
+
+    @staticmethod
+    async def _send(send, status: int, body: bytes, headers: list, content_length=True):
+        if content_length:
+            headers = [*headers, (b"content-length", b"%d" % len(body))]
+        await send(
+            {"type": "http.response.start", "status": status, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": body})
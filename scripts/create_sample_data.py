@@ -6,12 +6,77 @@ import logging
 import os
 import sys
 
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
 # Add the app directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
 from app.database import db_manager
 from app.models import ChargingStation, User
 
+# Sample charging stations data
+SAMPLE_STATIONS = (
+    {
+        "station_id": "CHARGER_001",
+        "name": "Downtown Charging Station",
+        "location": "123 Main Street, Downtown",
+        "is_online": True,
+    },
+    {
+        "station_id": "CHARGER_002",
+        "name": "Mall Charging Hub",
+        "location": "456 Shopping Mall, City Center",
+        "is_online": True,
+    },
+    {
+        "station_id": "CHARGER_003",
+        "name": "Highway Rest Stop Charger",
+        "location": "Highway 101, Exit 15",
+        "is_online": False,
+    },
+    {
+        "station_id": "CHARGER_004",
+        "name": "Office Building Charger",
+        "location": "789 Business District",
+        "is_online": True,
+    },
+    {
+        "station_id": "CHARGER_005",
+        "name": "Residential Area Charger",
+        "location": "321 Residential Street",
+        "is_online": True,
+    },
+)
+
+# Sample users data
+SAMPLE_USERS = (
+    {
+        "username": "john_doe",
+        "email": "john.doe@example.com",
+        "is_active": True,
+    },
+    {
+        "username": "jane_smith",
+        "email": "jane.smith@example.com",
+        "is_active": True,
+    },
+    {
+        "username": "mike_wilson",
+        "email": "mike.wilson@example.com",
+        "is_active": True,
+    },
+    {
+        "username": "sarah_jones",
+        "email": "sarah.jones@example.com",
+        "is_active": False,
+    },
+    {
+        "username": "admin_user",
+        "email": "admin@evcs.com",
+        "is_active": True,
+    },
+)
+
 
 async def create_sample_data():
     """Create sample data if it doesn't exist"""
@@ -21,141 +86,69 @@ async def create_sample_data():
     # Initialize database connection
     await db_manager.initialize()
 
-    # Sample charging stations data
-    sample_stations = [
-        {
-            "station_id": "CHARGER_001",
-            "name": "Downtown Charging Station",
-            "location": "123 Main Street, Downtown",
-            "is_online": True,
-        },
-        {
-            "station_id": "CHARGER_002",
-            "name": "Mall Charging Hub",
-            "location": "456 Shopping Mall, City Center",
-            "is_online": True,
-        },
-        {
-            "station_id": "CHARGER_003",
-            "name": "Highway Rest Stop Charger",
-            "location": "Highway 101, Exit 15",
-            "is_online": False,
-        },
-        {
-            "station_id": "CHARGER_004",
-            "name": "Office Building Charger",
-            "location": "789 Business District",
-            "is_online": True,
-        },
-        {
-            "station_id": "CHARGER_005",
-            "name": "Residential Area Charger",
-            "location": "321 Residential Street",
-            "is_online": True,
-        },
-    ]
-
-    # Sample users data
-    sample_users = [
-        {
-            "username": "john_doe",
-            "email": "john.doe@example.com",
-            "is_active": True,
-        },
-        {
-            "username": "jane_smith",
-            "email": "jane.smith@example.com",
-            "is_active": True,
-        },
-        {
-            "username": "mike_wilson",
-            "email": "mike.wilson@example.com",
-            "is_active": True,
-        },
-        {
-            "username": "sarah_jones",
-            "email": "sarah.jones@example.com",
-            "is_active": False,
-        },
-        {
-            "username": "admin_user",
-            "email": "admin@evcs.com",
-            "is_active": True,
-        },
-    ]
-
-    async for session in db_manager.get_session():
+    async with db_manager.session() as session:
         try:
             # Create charging stations
             logging.info("📡 Creating charging stations...")
-            stations_created = 0
-            stations_existing = 0
-
-            for station_data in sample_stations:
-                # Check if station already exists
-                from sqlalchemy import select
-
-                result = await session.execute(
-                    select(ChargingStation).where(
-                        ChargingStation.station_id == station_data["station_id"]
-                    )
+            now = datetime.now(timezone.utc)
+
+            # Existing stations are skipped by the database; RETURNING lists new ones
+            result = await session.execute(
+                pg_insert(ChargingStation)
+                .values(
+                    [
+                        {
+                            **station_data,
+                            "last_heartbeat": now
+                            if station_data["is_online"]
+                            else None,
+                        }
+                        for station_data in SAMPLE_STATIONS
+                    ]
                 )
-                existing_station = result.scalar_one_or_none()
+                .on_conflict_do_nothing(index_elements=["station_id"])
+                .returning(ChargingStation.station_id)
+            )
+            created_station_ids = set(result.scalars().all())
+            stations_created = len(created_station_ids)
+            stations_existing = len(SAMPLE_STATIONS) - stations_created
 
-                if existing_station:
+            for station_data in SAMPLE_STATIONS:
+                if station_data["station_id"] in created_station_ids:
                     logging.info(
-                        "   ⚠️  Station %s already exists - skipping",
+                        "   ✅ Created station: %s - %s",
                         station_data["station_id"],
+                        station_data["name"],
                     )
-                    stations_existing += 1
                 else:
-                    station = ChargingStation(
-                        station_id=station_data["station_id"],
-                        name=station_data["name"],
-                        location=station_data["location"],
-                        is_online=station_data["is_online"],
-                        last_heartbeat=datetime.now(timezone.utc)
-                        if station_data["is_online"]
-                        else None,
-                    )
-                    session.add(station)
                     logging.info(
-                        "   ✅ Created station: %s - %s",
+                        "   ⚠️  Station %s already exists - skipping",
                         station_data["station_id"],
-                        station_data["name"],
                     )
-                    stations_created += 1
 
             # Create users
             logging.info("👥 Creating users...")
-            users_created = 0
-            users_existing = 0
-
-            for user_data in sample_users:
-                # Check if user already exists
-                result = await session.execute(
-                    select(User).where(User.username == user_data["username"])
-                )
-                existing_user = result.scalar_one_or_none()
+            result = await session.execute(
+                pg_insert(User)
+                .values(list(SAMPLE_USERS))
+                .on_conflict_do_nothing(index_elements=["username"])
+                .returning(User.username)
+            )
+            created_usernames = set(result.scalars().all())
+            users_created = len(created_usernames)
+            users_existing = len(SAMPLE_USERS) - users_created
 
-                if existing_user:
-                    logging.info(
-                        "   ⚠️  User %s already exists - skipping", user_data["username"]
-                    )
-                    users_existing += 1
-                else:
-                    user = User(
-                        username=user_data["username"],
-                        email=user_data["email"],
-                        is_active=user_data["is_active"],
-                    )
-                    session.add(user)
+            for user_data in SAMPLE_USERS:
+                if user_data["username"] in created_usernames:
                     logging.info(
                         "   ✅ Created user: %s - %s",
                         user_data["username"],
                         user_data["email"],
                     )
-                    users_created += 1
+                else:
+                    logging.info(
+                        "   ⚠️  User %s already exists - skipping", user_data["username"]
+                    )
 
             # Commit all changes
             await session.commit()
@@ -176,8 +169,6 @@ async def create_sample_data():
         except Exception as e:
             logging.exception("❌ Error creating sample data: %s", e.message)
             await session.rollback()
-        finally:
-            await session.close()
 
     logging.info("\n🎉 Sample data creation completed!")
 
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Schema Creation Script for OCPP Backend Module
+Creates missing tables and indexes; run once per deployment instead of at startup
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app import models  # noqa: F401  (registers the tables on Base.metadata)
+from app.database import db_manager
+
+
+async def create_tables():
+    """Create all tables that do not exist yet"""
+
+    print("🛠️  Creating database tables...")
+
+    await db_manager.initialize()
+    try:
+        await db_manager.create_all(db_manager.engine)
+        print("🎉 Database tables are up to date!")
+    finally:
+        await db_manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(create_tables())
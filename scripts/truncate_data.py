@@ -8,6 +8,8 @@ import asyncio
 import os
 import sys
 
+from sqlalchemy import func, select, text
+
 # Add the app directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
@@ -23,25 +25,18 @@ async def truncate_data():
     # Initialize database connection
     await db_manager.initialize()
 
-    async for session in db_manager.get_session():
+    async with db_manager.session() as session:
         try:
-            # Get counts before deletion
-            from sqlalchemy import func, select
-
-            # Count existing records
-            station_count = await session.execute(
-                select(func.count(ChargingStation.id))
-            )
-            user_count = await session.execute(select(func.count(User.id)))
-            session_count = await session.execute(
-                select(func.count(ChargingSession.id))
+            # Count existing records in one round trip
+            result = await session.execute(
+                select(
+                    select(func.count(ChargingStation.id)).scalar_subquery(),
+                    select(func.count(User.id)).scalar_subquery(),
+                    select(func.count(ChargingSession.id)).scalar_subquery(),
+                    select(func.count(OCPPMessage.id)).scalar_subquery(),
+                )
             )
-            message_count = await session.execute(select(func.count(OCPPMessage.id)))
-
-            stations = station_count.scalar()
-            users = user_count.scalar()
-            sessions = session_count.scalar()
-            messages = message_count.scalar()
+            stations, users, sessions, messages = result.one()
 
             print("📊 That's will delete data:")
             print(f"   Charging Stations: {stations}")
@@ -53,28 +48,18 @@ async def truncate_data():
                 print("Database is already empty")
                 return
 
-            # Delete in reverse dependency order
+            # One TRUNCATE empties every table regardless of foreign key order
             print("\n🗑️  Deleting data...")
-
-            # Delete OCPP messages first
-            if messages > 0:
-                await session.execute("DELETE FROM ocpp_messages")
-                print(f"   Deleted {messages} OCPP messages")
-
-            # Delete charging sessions
-            if sessions > 0:
-                await session.execute("DELETE FROM charging_sessions")
-                print(f"   Deleted {sessions} charging sessions")
-
-            # Delete charging stations
-            if stations > 0:
-                await session.execute("DELETE FROM charging_stations")
-                print(f"   Deleted {stations} charging stations")
-
-            # Delete users
-            if users > 0:
-                await session.execute("DELETE FROM users")
-                print(f"   Deleted {users} users")
+            await session.execute(
+                text(
+                    "TRUNCATE charging_stations, users, charging_sessions, "
+                    "ocpp_messages RESTART IDENTITY CASCADE"
+                )
+            )
+            print(f"   Deleted {messages} OCPP messages")
+            print(f"   Deleted {sessions} charging sessions")
+            print(f"   Deleted {stations} charging stations")
+            print(f"   Deleted {users} users")
 
             # Commit all deletions
             await session.commit()
@@ -85,8 +70,6 @@ async def truncate_data():
         except Exception as e:
             print(f" Error truncating data: {e}")
             await session.rollback()
-        finally:
-            await session.close()
 
 
 if __name__ == "__main__":
@@ -4,6 +4,8 @@ set -e
 
 echo "Starting OCPP Backend Application..."
 
-# Start the FastAPI application with Uvicorn
+# Start the FastAPI application with Uvicorn on the uvloop event loop; the
+# OCPP websocket server is started from the app lifespan and shares it
 echo "Starting FastAPI server on port 8000..."
-exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
+exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload \
+    --loop uvloop --http httptools
@@ -1,174 +1,285 @@
 """Pytest configuration and fixtures."""
 
 import asyncio
-from unittest.mock import AsyncMock, MagicMock
+from datetime import UTC, datetime
+from types import MappingProxyType, SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from fastapi.testclient import TestClient
+import httpx
 import pytest
+import pytest_asyncio
 
 from app.main import app
 
+# Read-only sample data, shared by every test that requests it
+_SAMPLE_CHARGING_STATION = MappingProxyType(
+    {
+        "id": 1,
+        "station_id": "TEST_CHARGER_001",
+        "name": "Test Charger",
+        "location": "Test Location",
+        "is_online": True,
+        "last_heartbeat": "2024-01-01T00:00:00Z",
+        "created_at": "2024-01-01T00:00:00Z",
+    }
+)
+
+_SAMPLE_TRANSACTION = MappingProxyType(
+    {
+        "id": 1,
+        "session_id": "TEST_SESSION_001",
+        "station_id": "TEST_CHARGER_001",
+        "status": "active",
+        "energy_delivered": 1000,
+        "start_time": "2024-01-01T00:00:00Z",
+        "end_time": None,
+        "created_at": "2024-01-01T00:00:00Z",
+    }
+)
+
+_SAMPLE_OCPP_MESSAGE = MappingProxyType(
+    {
+        "id": 1,
+        "station_id": "TEST_CHARGER_001",
+        "message_type": "CALL",
+        "action": "BootNotification",
+        "message_id": "unique-id-1",
+        "payload": '{"chargePointModel": "Test Model"}',
+        "timestamp": "2024-01-01T00:00:00Z",
+    }
+)
+
+_SAMPLE_BOOT_NOTIFICATION = (
+    2,
+    "boot-001",
+    "BootNotification",
+    MappingProxyType(
+        {
+            "chargePointModel": "Tesla Wall Connector",
+            "chargePointVendor": "Tesla",
+            "chargePointSerialNumber": "TW123456789",
+            "chargeBoxSerialNumber": "CB123456789",
+            "firmwareVersion": "1.0.0",
+        }
+    ),
+)
+
+_SAMPLE_HEARTBEAT = (2, "heartbeat-001", "Heartbeat", MappingProxyType({}))
+
+_SAMPLE_STATUS_NOTIFICATION = (
+    2,
+    "status-001",
+    "StatusNotification",
+    MappingProxyType({"connectorId": 1, "errorCode": "NoError", "status": "Available"}),
+)
+
+_SAMPLE_START_TRANSACTION = (
+    2,
+    "start-001",
+    "StartTransaction",
+    MappingProxyType(
+        {
+            "connectorId": 1,
+            "idTag": "john_doe",
+            "meterStart": 0,
+            "timestamp": "2024-01-01T12:00:00Z",
+        }
+    ),
+)
+
+_SAMPLE_REMOTE_START_TRANSACTION = (
+    2,
+    "remote-start-001",
+    "RemoteStartTransaction",
+    MappingProxyType({"idTag": "john_doe", "connectorId": 1}),
+)
+
 
 @pytest.fixture(scope="session")
-def event_loop():
-    """Create an instance of the default event loop for the test session."""
-    loop = asyncio.get_event_loop_policy().new_event_loop()
-    yield loop
-    loop.close()
+def event_loop_policy():
+    """Run async tests on uvloop where it is installed."""
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.DefaultEventLoopPolicy()
+    return uvloop.EventLoopPolicy()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def client():
-    """Create test client for FastAPI app."""
+    """Create test client for FastAPI app, shared by the whole session."""
     return TestClient(app)
 
 
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def aclient():
+    """Async client calling the FastAPI app in-process, shared by the session."""
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield client
+
+
+async def _ignore(*args, **kwargs):
+    """Accept a websocket call without recording it."""
+
+
 @pytest.fixture
 def mock_websocket():
     """Mock WebSocket connection."""
-    websocket = AsyncMock()
-    websocket.recv = AsyncMock()
-    websocket.send = AsyncMock()
-    websocket.close = AsyncMock()
+    websocket = MagicMock()
+    websocket.recv = _ignore
+    websocket.send = _ignore
+    websocket.close = _ignore
     return websocket
 
 
+@pytest.fixture(scope="module")
+def charge_point_template():
+    """Build a ChargePoint and its websocket once per test module."""
+    from app.ocpp_server import ChargePoint
+
+    websocket = MagicMock()
+    websocket.request = SimpleNamespace(path="/CHARGER_001")
+    websocket.recv = _ignore
+    websocket.send = _ignore
+    return ChargePoint("CHARGER_001", websocket)
+
+
+@pytest.fixture
+def mock_charge_point(charge_point_template):
+    """Module's shared charge point, reset to its freshly connected state."""
+    cp = charge_point_template
+    cp._connection.reset_mock()  # noqa: SLF001
+    cp.is_online = True
+    cp.last_heartbeat = datetime.now(UTC)
+    cp.connector_status = {}
+    cp._session = None  # noqa: SLF001
+    cp._active_sessions = {}  # noqa: SLF001
+    return cp
+
+
 @pytest.fixture
 def mock_database_session():
     """Mock database session."""
-    session = AsyncMock()
-    session.execute = AsyncMock()
+    # Only the methods the code awaits are async; add() and begin() are sync
+    session = MagicMock()
+    session.execute = AsyncMock(return_value=MagicMock())
+    session.flush = AsyncMock()
     session.commit = AsyncMock()
     session.close = AsyncMock()
     session.refresh = AsyncMock()
-    session.add = MagicMock()
     return session
 
 
 @pytest.fixture
 def sample_charging_station():
     """Sample charging station data."""
-    return {
-        "id": 1,
-        "station_id": "TEST_CHARGER_001",
-        "name": "Test Charger",
-        "location": "Test Location",
-        "is_online": True,
-        "last_heartbeat": "2024-01-01T00:00:00Z",
-        "created_at": "2024-01-01T00:00:00Z",
-    }
+    return _SAMPLE_CHARGING_STATION
 
 
 @pytest.fixture
 def sample_transaction():
     """Sample transaction data."""
-    return {
-        "id": 1,
-        "session_id": "TEST_SESSION_001",
-        "station_id": "TEST_CHARGER_001",
-        "status": "active",
-        "energy_delivered": 1000,
-        "start_time": "2024-01-01T00:00:00Z",
-        "end_time": None,
-        "created_at": "2024-01-01T00:00:00Z",
-    }
+    return _SAMPLE_TRANSACTION
 
 
 @pytest.fixture
 def sample_ocpp_message():
     """Sample OCPP message data."""
-    return {
-        "id": 1,
-        "station_id": "TEST_CHARGER_001",
-        "message_type": "CALL",
-        "action": "BootNotification",
-        "message_id": "unique-id-1",
-        "payload": '{"chargePointModel": "Test Model"}',
-        "timestamp": "2024-01-01T00:00:00Z",
-    }
+    return _SAMPLE_OCPP_MESSAGE
 
 
 @pytest.fixture
 def sample_boot_notification():
     """Sample BootNotification message."""
-    return [
-        2,
-        "boot-001",
-        "BootNotification",
-        {
-            "chargePointModel": "Tesla Wall Connector",
-            "chargePointVendor": "Tesla",
-            "chargePointSerialNumber": "TW123456789",
-            "chargeBoxSerialNumber": "CB123456789",
-            "firmwareVersion": "1.0.0",
-        },
-    ]
+    return _SAMPLE_BOOT_NOTIFICATION
 
 
 @pytest.fixture
 def sample_heartbeat():
     """Sample Heartbeat message."""
-    return [2, "heartbeat-001", "Heartbeat", {}]
+    return _SAMPLE_HEARTBEAT
 
 
 @pytest.fixture
 def sample_status_notification():
     """Sample StatusNotification message."""
-    return [
-        2,
-        "status-001",
-        "StatusNotification",
-        {"connectorId": 1, "errorCode": "NoError", "status": "Available"},
-    ]
+    return _SAMPLE_STATUS_NOTIFICATION
 
 
 @pytest.fixture
 def sample_start_transaction():
     """Sample StartTransaction message."""
-    return [
-        2,
-        "start-001",
-        "StartTransaction",
-        {
-            "connectorId": 1,
-            "idTag": "john_doe",
-            "meterStart": 0,
-            "timestamp": "2024-01-01T12:00:00Z",
-        },
-    ]
+    return _SAMPLE_START_TRANSACTION
 
 
 @pytest.fixture
 def sample_remote_start_transaction():
     """Sample RemoteStartTransaction message."""
-    return [
-        2,
-        "remote-start-001",
-        "RemoteStartTransaction",
-        {"idTag": "john_doe", "connectorId": 1},
-    ]
+    return _SAMPLE_REMOTE_START_TRANSACTION
+
+
+@pytest.fixture(scope="session", autouse=True)
+def patched_db_session():
+    """Patch the OCPP server's db_manager.session once for the whole run."""
+    session = MagicMock()
+    for name in ("execute", "flush", "commit", "rollback", "close", "connection"):
+        setattr(session, name, AsyncMock())
+    patcher = patch("app.ocpp_server.db_manager.session", new_callable=MagicMock)
+    session_cm = patcher.start()
+    session_cm.return_value.__aenter__.return_value = session
+    yield session_cm
+    patcher.stop()
+
+
+@pytest.fixture(autouse=True)
+def db_session(patched_db_session):
+    """Database session handed out by db_manager.session, reset for each test."""
+    session = patched_db_session.return_value.__aenter__.return_value
+    session.reset_mock(return_value=True, side_effect=True)
+    patched_db_session.reset_mock()
+    return session
 
 
 @pytest.fixture(autouse=True)
-def mock_db_manager():
-    """Mock database manager for all tests."""
-    with pytest.MonkeyPatch().context() as m:
-        from app import database
+def clear_response_caches():
+    """Start every test without cached API responses."""
+    from app import main
 
-        m.setattr(database, "db_manager", AsyncMock())
-        yield
+    main.chargers_cache.clear()
+    main.active_chargers_cache.clear()
 
 
-@pytest.fixture
-def mock_ocpp_server():
-    """Mock OCPP server functions."""
-    with pytest.MonkeyPatch().context() as m:
-        from app import ocpp_server
+@pytest.fixture(autouse=True)
+def reset_active_charge_points():
+    """Start and end every test with no connected charge points."""
+    from app import ocpp_server
+
+    ocpp_server.active_charge_points.clear()
+    yield
+    ocpp_server.active_charge_points.clear()
 
-        m.setattr(ocpp_server, "get_active_charge_points", MagicMock(return_value={}))
-        m.setattr(ocpp_server, "get_charge_point", MagicMock(return_value=None))
-        yield
 
+@pytest.fixture(autouse=True)
+def reset_registered_station_ids():
+    """Start every test with an empty registered-station cache."""
+    from app import ocpp_server
+
+    ocpp_server.registered_station_ids.clear()
+    ocpp_server._registered_refreshed_at = None  # noqa: SLF001
+    yield
+    ocpp_server.registered_station_ids.clear()
+    ocpp_server._registered_refreshed_at = None  # noqa: SLF001
+
+
+@pytest.fixture
+def mock_ocpp_server(monkeypatch):
+    """Mock OCPP server functions."""
+    from app import ocpp_server
 
-# Pytest markers
-pytest_plugins = ["pytest_asyncio"]
+    monkeypatch.setattr(
+        ocpp_server, "get_active_charge_points", MagicMock(return_value={})
+    )
+    monkeypatch.setattr(ocpp_server, "get_charge_point", MagicMock(return_value=None))
@@ -1,26 +1,28 @@
 """Test cases for REST API endpoints."""
 
+from datetime import datetime, timezone
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from fastapi.testclient import TestClient
 import pytest
 
-from app.main import app
+from app.health_interceptor import HealthInterceptor
+from app.ocpp_server import ChargePoint, active_charge_points
 
+# Timestamps of the sample_charging_station fixture, parsed once
+_LAST_HEARTBEAT_DT = datetime(2024, 1, 1, tzinfo=timezone.utc)
+_CREATED_AT_DT = datetime(2024, 1, 1, tzinfo=timezone.utc)
 
-@pytest.fixture
-def client():
-    """Create test client."""
-    return TestClient(app)
 
-
-@pytest.fixture
-def mock_db_manager():
-    """Mock database manager."""
+@pytest.fixture(autouse=True)
+def mock_db_manager(patched_db_session):
+    """Mock the API's database manager, handing out the shared db_session."""
     with patch("app.main.db_manager") as mock:
         mock.health_check = AsyncMock(
             return_value={"status": "healthy", "message": "OK"}
         )
+        mock.session = patched_db_session
         yield mock
 
 
@@ -40,67 +42,130 @@ class TestHealthEndpoint:
         assert "database" in data["services"]
         assert "ocpp_server" in data["services"]
 
+    def test_health_check_method_not_allowed(self, client):
+        """Test health requests other than GET and HEAD are rejected."""
+        response = client.post("/health")
+        assert response.status_code == 405
+        assert response.headers["allow"] == "GET, HEAD"
+
+    def test_health_check_head(self):
+        """Test HEAD probes get the GET headers without a body."""
+        render = AsyncMock(return_value={"status": "healthy"})
+        client = TestClient(HealthInterceptor(MagicMock(), render, ttl=60))
+
+        get = client.get("/health")
+        head = client.head("/health")
+
+        assert head.status_code == 200
+        assert head.content == b""
+        assert head.headers["content-length"] == get.headers["content-length"]
+        assert head.headers["content-type"] == "application/json"
+
+    def test_health_response_is_cached(self):
+        """Test the health body is rendered once per TTL window."""
+        render = AsyncMock(return_value={"status": "healthy"})
+        client = TestClient(HealthInterceptor(MagicMock(), render, ttl=60))
+
+        first = client.get("/health")
+        second = client.get("/health")
+
+        assert first.json() == second.json() == {"status": "healthy"}
+        render.assert_called_once()
+
 
 class TestChargersEndpoint:
     """Test chargers endpoints."""
 
-    @patch("app.main.db_manager.get_session")
-    def test_get_chargers_empty(self, mock_get_session, client):
+    def test_get_chargers_empty(self, client, db_session):
         """Test getting chargers when none exist."""
         # Mock empty result
-        mock_session = AsyncMock()
         mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = []
-        mock_session.execute.return_value = mock_result
-
-        async def mock_session_generator():
-            yield mock_session
-
-        mock_get_session.return_value = mock_session_generator()
+        mock_result.all.return_value = []
+        db_session.execute.return_value = mock_result
 
         response = client.get("/chargers")
         assert response.status_code == 200
         data = response.json()
-        assert data == []
+        assert data == {"items": [], "next_cursor": None}
 
-    @patch("app.main.db_manager.get_session")
-    def test_get_chargers_with_data(
-        self, mock_get_session, client, sample_charging_station
-    ):
+    def test_get_chargers_with_data(self, client, sample_charging_station, db_session):
         """Test getting chargers with data."""
-        # Mock result with sample data
-        mock_session = AsyncMock()
-        mock_station = MagicMock()
-        mock_station.id = sample_charging_station["id"]
-        mock_station.station_id = sample_charging_station["station_id"]
-        mock_station.name = sample_charging_station["name"]
-        mock_station.location = sample_charging_station["location"]
-        mock_station.is_online = sample_charging_station["is_online"]
-        # Mock last_heartbeat and created_at as datetime objects with isoformat method
-        from datetime import datetime
-
-        mock_station.last_heartbeat = datetime.fromisoformat(
-            sample_charging_station["last_heartbeat"].replace("Z", "+00:00")
-        )
-        mock_station.created_at = datetime.fromisoformat(
-            sample_charging_station["created_at"].replace("Z", "+00:00")
+        # Result row with sample data, datetimes as the database returns them
+        mock_station = SimpleNamespace(
+            **{
+                **sample_charging_station,
+                "last_heartbeat": _LAST_HEARTBEAT_DT,
+                "created_at": _CREATED_AT_DT,
+            }
         )
 
         mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = [mock_station]
-        mock_session.execute.return_value = mock_result
+        mock_result.all.return_value = [mock_station]
+        db_session.execute.return_value = mock_result
 
-        # Mock the async context manager
-        async def mock_session_generator():
-            yield mock_session
+        response = client.get("/chargers")
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["items"]) == 1
+        assert data["items"][0]["id"] == sample_charging_station["station_id"]
+        assert data["next_cursor"] is None
+
+    def test_get_chargers_next_page(self, client, sample_charging_station, db_session):
+        """Test a full page returns the cursor of its last row."""
+        stations = [
+            SimpleNamespace(
+                id=pk,
+                station_id=f"CHARGER_00{pk}",
+                name=sample_charging_station["name"],
+                location=None,
+                is_online=False,
+                last_heartbeat=None,
+                created_at=_CREATED_AT_DT,
+            )
+            for pk in (1, 2, 3)
+        ]
 
-        mock_get_session.return_value = mock_session_generator()
+        mock_result = MagicMock()
+        mock_result.all.return_value = stations
+        db_session.execute.return_value = mock_result
 
-        response = client.get("/chargers")
+        response = client.get("/chargers?limit=2&cursor=0")
         assert response.status_code == 200
         data = response.json()
-        assert len(data) == 1
-        assert data[0]["id"] == sample_charging_station["station_id"]
+        assert [c["id"] for c in data["items"]] == ["CHARGER_001", "CHARGER_002"]
+        assert data["next_cursor"] == "2"
+
+    def test_get_chargers_cached(self, client, db_session):
+        """Test repeated polling within the TTL is served from the cache."""
+        mock_result = MagicMock()
+        mock_result.all.return_value = []
+        db_session.execute.return_value = mock_result
+
+        first = client.get("/chargers")
+        second = client.get("/chargers")
+
+        assert first.json() == second.json()
+        db_session.execute.assert_called_once()
+
+    async def test_get_chargers_cache_cleared_on_boot(self, aclient, db_session):
+        """Test a BootNotification drops the cached charger list."""
+        mock_result = MagicMock()
+        mock_result.all.return_value = []
+        db_session.execute.return_value = mock_result
+
+        await aclient.get("/chargers")
+        charge_point = ChargePoint("CHARGER_001", AsyncMock())
+        await charge_point.on_boot_notification(
+            charge_point_model="Model", charge_point_vendor="Vendor"
+        )
+        await aclient.get("/chargers")
+
+        assert db_session.execute.call_count == 2
+
+    def test_get_chargers_invalid_cursor(self, client):
+        """Test a malformed cursor is rejected."""
+        response = client.get("/chargers?cursor=abc")
+        assert response.status_code == 400
 
     @patch("app.main.get_active_charge_points")
     def test_get_active_chargers_empty(self, mock_get_active, client):
@@ -120,8 +185,7 @@ class TestChargersEndpoint:
         mock_cp = MagicMock()
         mock_cp.station_id = "CHARGER_001"
         mock_cp.is_online = True
-        mock_cp.last_heartbeat = MagicMock()
-        mock_cp.last_heartbeat.isoformat.return_value = "2024-01-01T00:00:00Z"
+        mock_cp.last_heartbeat = _LAST_HEARTBEAT_DT
         mock_cp.connector_status = {1: {"status": "Available"}}
 
         mock_get_active.return_value = {"CHARGER_001": mock_cp}
@@ -133,148 +197,178 @@ class TestChargersEndpoint:
         assert "CHARGER_001" in data["active_chargers"]
         assert len(data["chargers"]) == 1
         assert data["chargers"][0]["station_id"] == "CHARGER_001"
-
-
-class TestChargerControl:
-    """Test charger control endpoints."""
-
-    @patch("app.main.get_charge_point")
-    def test_start_charging_charger_not_found(self, mock_get_charge_point, client):
-        """Test starting charging when charger not found."""
-        mock_get_charge_point.return_value = None
-
-        response = client.post(
-            "/chargers/TEST_CHARGER/start",
-            json={"id_tag": "USER123", "connector_id": 1},
+        assert data["chargers"][0]["last_heartbeat"] == "2024-01-01T00:00:00+00:00"
+        assert data["chargers"][0]["connector_status"] == {"1": {"status": "Available"}}
+
+    async def test_status_notification_clears_active_chargers_cache(self, aclient):
+        """Test a connector status change shows on the next active-list poll."""
+        charge_point = ChargePoint("CHARGER_001", AsyncMock())
+        active_charge_points["CHARGER_001"] = charge_point
+        await charge_point.on_status_notification(
+            connector_id=1, error_code="NoError", status="Available"
         )
-        assert response.status_code == 404
-        assert "Charger not found" in response.json()["detail"]
 
-    @patch("app.main.get_charge_point")
-    def test_start_charging_success(self, mock_get_charge_point, client):
-        """Test successful remote start transaction."""
-        mock_cp = MagicMock()
-        mock_cp.send_remote_start_transaction = AsyncMock(
-            return_value={"status": "Accepted"}
+        first = await aclient.get("/chargers/active")
+        await charge_point.on_status_notification(
+            connector_id=1, error_code="NoError", status="Charging"
         )
-        mock_get_charge_point.return_value = mock_cp
+        second = await aclient.get("/chargers/active")
 
-        response = client.post(
-            "/chargers/CHARGER_001/start",
-            json={"id_tag": "john_doe", "connector_id": 1},
+        assert first.json()["chargers"][0]["connector_status"]["1"]["status"] == (
+            "Available"
         )
-        assert response.status_code == 200
-        data = response.json()
-        assert data["status"] == "success"
-        mock_cp.send_remote_start_transaction.assert_called_once_with(
-            id_tag="john_doe", connector_id=1
+        assert second.json()["chargers"][0]["connector_status"]["1"]["status"] == (
+            "Charging"
         )
 
-    @patch("app.main.get_charge_point")
-    def test_stop_charging_charger_not_found(self, mock_get_charge_point, client):
-        """Test stopping charging when charger not found."""
-        mock_get_charge_point.return_value = None
 
-        response = client.post(
-            "/chargers/TEST_CHARGER/stop", json={"transaction_id": 12345}
-        )
-        assert response.status_code == 404
-        assert "Charger not found" in response.json()["detail"]
+CONTROL_COMMANDS = [
+    (
+        "start",
+        {"id_tag": "john_doe", "connector_id": 1},
+        "send_remote_start_transaction",
+        {"id_tag": "john_doe", "connector_id": 1},
+    ),
+    (
+        "stop",
+        {"transaction_id": 12345},
+        "send_remote_stop_transaction",
+        {"transaction_id": 12345},
+    ),
+    (
+        "configure",
+        {"key": "HeartbeatInterval", "value": "300"},
+        "send_change_configuration",
+        {"key": "HeartbeatInterval", "value": "300"},
+    ),
+]
 
-    @patch("app.main.get_charge_point")
-    def test_stop_charging_success(self, mock_get_charge_point, client):
-        """Test successful remote stop transaction."""
-        mock_cp = MagicMock()
-        mock_cp.send_remote_stop_transaction = AsyncMock(
-            return_value={"status": "Accepted"}
-        )
-        mock_get_charge_point.return_value = mock_cp
 
-        response = client.post(
-            "/chargers/CHARGER_001/stop",
-            json={"transaction_id": 12345},
-        )
-        assert response.status_code == 200
-        data = response.json()
-        assert data["status"] == "success"
-        mock_cp.send_remote_stop_transaction.assert_called_once_with(
-            transaction_id=12345
-        )
+class TestChargerControl:
+    """Test charger control endpoints."""
 
+    @pytest.mark.parametrize(
+        ("path", "payload"), [command[:2] for command in CONTROL_COMMANDS]
+    )
     @patch("app.main.get_charge_point")
-    def test_configure_charger_not_found(self, mock_get_charge_point, client):
-        """Test configuring charger when charger not found."""
+    def test_command_charger_not_found(
+        self, mock_get_charge_point, client, path, payload
+    ):
+        """Test control commands when the charger is not connected."""
         mock_get_charge_point.return_value = None
 
-        response = client.post(
-            "/chargers/TEST_CHARGER/configure",
-            json={"key": "HeartbeatInterval", "value": "300"},
-        )
+        response = client.post(f"/chargers/TEST_CHARGER/{path}", json=payload)
         assert response.status_code == 404
         assert "Charger not found" in response.json()["detail"]
 
+    @pytest.mark.parametrize(("path", "payload", "method", "kwargs"), CONTROL_COMMANDS)
     @patch("app.main.get_charge_point")
-    def test_configure_charger_success(self, mock_get_charge_point, client):
-        """Test successful configuration change."""
+    def test_command_success(
+        self, mock_get_charge_point, client, path, payload, method, kwargs
+    ):
+        """Test control commands are forwarded to the charge point."""
         mock_cp = MagicMock()
-        mock_cp.send_change_configuration = AsyncMock(
-            return_value={"status": "Accepted"}
-        )
+        setattr(mock_cp, method, AsyncMock(return_value={"status": "Accepted"}))
         mock_get_charge_point.return_value = mock_cp
 
-        response = client.post(
-            "/chargers/CHARGER_001/configure",
-            json={"key": "HeartbeatInterval", "value": "300"},
-        )
+        response = client.post(f"/chargers/CHARGER_001/{path}", json=payload)
         assert response.status_code == 200
         data = response.json()
         assert data["status"] == "success"
-        mock_cp.send_change_configuration.assert_called_once_with(
-            key="HeartbeatInterval", value="300"
+        getattr(mock_cp, method).assert_called_once_with(**kwargs)
+
+    def test_start_charging_rejects_unknown_fields(self, client):
+        """Test request bodies with unexpected fields are rejected."""
+        response = client.post(
+            "/chargers/CHARGER_001/start",
+            json={"id_tag": "john_doe", "connector": 1},
         )
+        assert response.status_code == 422
 
 
 class TestTransactionsEndpoint:
     """Test transactions endpoints."""
 
-    @patch("app.main.db_manager.get_session")
-    def test_get_transactions_empty(self, mock_get_session, client):
+    def test_get_transactions_empty(self, client, db_session):
         """Test getting transactions when none exist."""
         # Mock empty result
-        mock_session = AsyncMock()
         mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = []
-        mock_session.execute.return_value = mock_result
+        mock_result.all.return_value = []
+        db_session.execute.return_value = mock_result
+
+        response = client.get("/transactions")
+        assert response.status_code == 200
+        data = response.json()
+        assert data == {"items": [], "next_cursor": None}
+
+    def test_get_transactions_next_page(self, client, sample_transaction, db_session):
+        """Test a cursor continues below its id and a full page returns the next."""
+        transactions = [
+            SimpleNamespace(
+                **{
+                    **sample_transaction,
+                    "id": pk,
+                    "session_id": f"TEST_SESSION_00{pk}",
+                    "start_time": _CREATED_AT_DT,
+                    "created_at": _CREATED_AT_DT,
+                }
+            )
+            for pk in (9, 8, 7)
+        ]
+
+        mock_result = MagicMock()
+        mock_result.all.return_value = transactions
+        db_session.execute.return_value = mock_result
 
-        # Mock the async context manager
-        async def mock_session_generator():
-            yield mock_session
+        response = client.get("/transactions?limit=2&cursor=10")
+        assert response.status_code == 200
+        data = response.json()
+        assert [t["id"] for t in data["items"]] == [9, 8]
+        assert data["next_cursor"] == "8"
+
+        statement = db_session.execute.call_args.args[0]
+        assert "charging_sessions.id < " in str(statement)
+        assert 10 in statement.compile().params.values()
+
+    def test_get_transactions_invalid_cursor(self, client):
+        """Test a malformed cursor is rejected."""
+        response = client.get("/transactions?cursor=abc")
+        assert response.status_code == 400
+
+    def test_get_station_transactions(self, client, sample_transaction, db_session):
+        """Test the per-station list only queries that station's sessions."""
+        transaction = SimpleNamespace(
+            **{
+                **sample_transaction,
+                "start_time": _CREATED_AT_DT,
+                "created_at": _CREATED_AT_DT,
+            }
+        )
 
-        mock_get_session.return_value = mock_session_generator()
+        mock_result = MagicMock()
+        mock_result.all.return_value = [transaction]
+        db_session.execute.return_value = mock_result
 
-        response = client.get("/transactions")
+        response = client.get("/transactions/TEST_CHARGER_001")
         assert response.status_code == 200
         data = response.json()
-        assert data == []
+        assert [t["station_id"] for t in data["items"]] == ["TEST_CHARGER_001"]
+        assert data["next_cursor"] is None
+
+        statement = db_session.execute.call_args.args[0]
+        assert "charging_sessions.station_id = " in str(statement)
+        assert "TEST_CHARGER_001" in statement.compile().params.values()
 
 
 class TestMessagesEndpoint:
     """Test messages endpoints."""
 
-    @patch("app.main.db_manager.get_session")
-    def test_get_messages_empty(self, mock_get_session, client):
+    def test_get_messages_empty(self, client, db_session):
         """Test getting messages when none exist."""
         # Mock empty result
-        mock_session = AsyncMock()
         mock_result = MagicMock()
-        mock_result.scalars.return_value.all.return_value = []
-        mock_session.execute.return_value = mock_result
-
-        # Mock the async context manager
-        async def mock_session_generator():
-            yield mock_session
-
-        mock_get_session.return_value = mock_session_generator()
+        mock_result.all.return_value = []
+        db_session.execute.return_value = mock_result
 
         response = client.get("/messages/TEST_STATION")
         assert response.status_code == 200
@@ -293,6 +387,15 @@ class TestRootEndpoint:
         # Should return HTML content
         assert "text/html" in response.headers["content-type"]
 
+    def test_root_endpoint_reads_page_once(self, client):
+        """Test the frontend page is served from memory after the first read."""
+        client.get("/")
+        with patch("builtins.open") as mock_open:
+            response = client.get("/")
+
+        assert response.status_code == 200
+        mock_open.assert_not_called()
+
     def test_api_info_endpoint(self, client):
         """Test API info endpoint."""
         response = client.get("/api")
@@ -301,3 +404,28 @@ class TestRootEndpoint:
         assert "message" in data
         assert "version" in data
         assert "endpoints" in data
+
+
+class TestStaticFiles:
+    """Test in-memory static file serving."""
+
+    def test_static_file(self, client):
+        """Test a static file is served with caching headers."""
+        response = client.get("/static/index.html")
+        assert response.status_code == 200
+        assert "text/html" in response.headers["content-type"]
+        assert response.headers["etag"]
+        assert "max-age" in response.headers["cache-control"]
+
+    def test_static_file_not_modified(self, client):
+        """Test a matching If-None-Match gets 304 without a body."""
+        etag = client.get("/static/index.html").headers["etag"]
+
+        response = client.get("/static/index.html", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+    def test_static_file_not_found(self, client):
+        """Test unknown static files return 404."""
+        response = client.get("/static/missing.js")
+        assert response.status_code == 404
@@ -0,0 +1,63 @@
+"""Test cases for the database manager."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.database import DatabaseManager
+
+
+@pytest.fixture
+def db_manager():
+    """Database manager with a mocked engine answering SELECT 1."""
+    manager = DatabaseManager()
+    conn = AsyncMock()
+    conn.execute.return_value.fetchone = MagicMock(return_value=(1,))
+    manager.engine = MagicMock()
+    manager.engine.begin.return_value.__aenter__.return_value = conn
+    return manager
+
+
+class TestHealthCheck:
+    """Test database health check."""
+
+    async def test_health_check_not_initialized(self):
+        """Test health check before the engine is created."""
+        result = await DatabaseManager().health_check()
+
+        assert result["status"] == "error"
+
+    async def test_health_check_is_cached(self, db_manager):
+        """Test repeated health checks reuse the first result."""
+        first = await db_manager.health_check()
+        second = await db_manager.health_check()
+
+        assert first["status"] == "healthy"
+        assert second is first
+        db_manager.engine.begin.assert_called_once()
+
+    async def test_health_check_refreshed_after_ttl(self, db_manager):
+        """Test the database is queried again once the result expires."""
+        db_manager.health_check_ttl = 0
+
+        await db_manager.health_check()
+        await db_manager.health_check()
+
+        assert db_manager.engine.begin.call_count == 2
+
+
+class TestWarmUp:
+    """Test connection pool warm-up."""
+
+    async def test_warm_up_opens_pool_size_connections(self, db_manager):
+        """Test one connection is opened per pooled slot."""
+        db_manager.pool_size = 3
+
+        await db_manager.warm_up()
+
+        assert db_manager.engine.connect.call_count == 3
+
+    async def test_warm_up_not_initialized(self):
+        """Test warm-up requires an initialized engine."""
+        with pytest.raises(Exception, match="Database not initialized"):
+            await DatabaseManager().warm_up()
@@ -1,15 +1,67 @@
-from datetime import datetime
+import asyncio
+from datetime import UTC, datetime
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from sqlalchemy import create_engine, insert, select
+import time_machine
 
+from app.models import ChargingSession, ChargingStation
 from app.ocpp_server import (
+    COPY_THRESHOLD,
+    STATION_LOOKUP_STMT,
+    STATION_OFFLINE_STMT,
+    STOP_ACTIVE_SESSIONS_STMT,
+    STOP_SESSION_STMT,
     ChargePoint,
+    _closing_tasks,
+    active_charge_points,
+    flush_pending_writes,
     get_active_charge_points,
     get_charge_point,
+    is_registered_station,
     on_connect,
+    pending_heartbeats,
+    pending_messages,
+    register_charge_point,
+    select_ocpp_subprotocol,
+    unregister_charge_point,
 )
 
+# Wall-clock time seen by every test in this module
+FROZEN_NOW = datetime(2024, 1, 1, 12, 0, tzinfo=UTC)
+
+# Charger-reported transaction timestamps, passed through as ISO-8601 strings
+_TS_START = "2024-01-01T00:00:00Z"
+_TS_STOP = "2024-01-01T01:00:00Z"
+
+
+@pytest.fixture(autouse=True, scope="module")
+def frozen_clock():
+    """Freeze the wall clock, so handler timestamps are deterministic."""
+    with time_machine.travel(FROZEN_NOW, tick=False) as traveller:
+        yield traveller
+
+
+async def _ignore(*args, **kwargs):
+    """Accept a websocket send or recv without recording it."""
+
+
+def accepted_reply() -> asyncio.Future:
+    """Completed future with an Accepted reply, awaited without yielding."""
+    reply = asyncio.get_running_loop().create_future()
+    reply.set_result({"status": "Accepted"})
+    return reply
+
+
+def drain_pending_messages() -> list:
+    """Remove and return every message queued for the flusher."""
+    messages = []
+    while not pending_messages.empty():
+        messages.append(pending_messages.get_nowait())
+    return messages
+
 
 class TestChargePoint:
     """Test ChargePoint class functionality."""
@@ -17,9 +69,9 @@ class TestChargePoint:
     @pytest.fixture
     def mock_websocket(self):
         """Mock WebSocket connection."""
-        websocket = AsyncMock()
-        websocket.recv = AsyncMock()
-        websocket.send = AsyncMock()
+        websocket = MagicMock()
+        websocket.recv = _ignore
+        websocket.send = _ignore
         return websocket
 
     @pytest.fixture
@@ -31,37 +83,43 @@ class TestChargePoint:
         """Test ChargePoint initialization."""
         assert charge_point.station_id == "TEST_CHARGER_001"
         assert charge_point.is_online is True
-        assert isinstance(charge_point.last_heartbeat, datetime)
-
-    @pytest.mark.asyncio
-    @patch("app.ocpp_server.db_manager.get_session")
-    async def test_on_boot_notification(self, mock_get_session, charge_point):
-        """Test BootNotification handler."""
-        # Mock database session
-        mock_session = AsyncMock()
-        mock_session.execute.return_value.scalar_one_or_none.return_value = None
-        mock_session.commit = AsyncMock()
-        mock_session.refresh = AsyncMock()
-        mock_get_session.return_value.__aenter__.return_value = mock_session
-
-        # Test BootNotification
-        result = await charge_point.on_boot_notification(
-            charge_point_model="Test Model", charge_point_vendor="Test Vendor"
+        assert charge_point.last_heartbeat == FROZEN_NOW
+
+    async def test_on_boot_notification(self, charge_point, mock_database_session):
+        """Test BootNotification registers an unknown station."""
+        mock_database_session.execute.return_value.scalar_one_or_none.return_value = (
+            None
         )
 
+        with patch(
+            "app.ocpp_server.db_manager.session_factory",
+            return_value=mock_database_session,
+        ):
+            result = await charge_point.on_boot_notification(
+                charge_point_model="Test Model", charge_point_vendor="Test Vendor"
+            )
+
         assert result.current_time is not None
         assert result.interval == 300
         assert result.status.value == "Accepted"
 
-    @pytest.mark.asyncio
+        statement, params = mock_database_session.execute.call_args.args
+        assert statement is STATION_LOOKUP_STMT
+        assert params == {"station_id": "TEST_CHARGER_001"}
+        (station,), _ = mock_database_session.add.call_args
+        assert isinstance(station, ChargingStation)
+        assert station.station_id == "TEST_CHARGER_001"
+        assert station.name == "Test Vendor Test Model"
+        assert station.is_online is True
+        assert station.last_heartbeat == FROZEN_NOW
+        mock_database_session.flush.assert_awaited_once()
+
     async def test_on_heartbeat(self, charge_point):
         """Test Heartbeat handler."""
-        with patch("app.ocpp_server.db_manager.get_session"):
-            result = await charge_point.on_heartbeat()
+        result = await charge_point.on_heartbeat()
 
-            assert result.current_time is not None
+        assert result.current_time is not None
 
-    @pytest.mark.asyncio
     async def test_on_status_notification(self, charge_point):
         """Test StatusNotification handler."""
         result = await charge_point.on_status_notification(
@@ -69,63 +127,130 @@ class TestChargePoint:
         )
 
         assert result is not None
-        assert charge_point.connector_status[1]["status"] == "Available"
+        connector = charge_point.connector_status[1]
+        assert connector["status"] == "Available"
+        assert connector["error_code"] == "NoError"
 
-    @pytest.mark.asyncio
     async def test_on_start_transaction(self, charge_point):
         """Test StartTransaction handler."""
-        with patch("app.ocpp_server.db_manager.get_session"):
-            result = await charge_point.on_start_transaction(
+        result = await charge_point.on_start_transaction(
+            connector_id=1,
+            id_tag="USER123",
+            meter_start=0,
+            timestamp=_TS_START,
+        )
+
+        assert result.transaction_id is not None
+        assert result.id_tag_info["status"].value == "Accepted"
+
+    async def test_on_stop_transaction(self, charge_point):
+        """Test StopTransaction handler."""
+        result = await charge_point.on_stop_transaction(
+            transaction_id=12345, timestamp=_TS_STOP, meter_stop=1000
+        )
+
+        assert result is not None
+
+    async def test_stop_transaction_updates_started_session(
+        self, charge_point, mock_database_session
+    ):
+        """Test StopTransaction updates the session created by its start."""
+        mock_database_session.add.side_effect = lambda obj: setattr(obj, "id", 42)
+
+        with patch(
+            "app.ocpp_server.db_manager.session_factory",
+            return_value=mock_database_session,
+        ):
+            start = await charge_point.on_start_transaction(
                 connector_id=1,
                 id_tag="USER123",
                 meter_start=0,
-                timestamp="2024-01-01T00:00:00Z",
+                timestamp=_TS_START,
+            )
+            await charge_point.on_stop_transaction(
+                transaction_id=start.transaction_id,
+                timestamp=_TS_STOP,
+                meter_stop=1000,
             )
 
-            assert result.transaction_id is not None
-            assert result.id_tag_info["status"].value == "Accepted"
+        statement, params = mock_database_session.execute.call_args.args
+        assert statement is STOP_SESSION_STMT
+        assert params["session_pk"] == 42
+        assert params["meter_stop"] == 1000
+        assert charge_point._active_sessions == {}  # noqa: SLF001
+
+    async def test_stop_unknown_transaction_spares_other_connectors(
+        self, charge_point, mock_database_session
+    ):
+        """Test a StopTransaction after reconnect completes only its own session."""
+        engine = create_engine("sqlite://")
+        ChargingSession.__table__.create(engine)
+        with engine.begin() as conn:
+            conn.execute(
+                insert(ChargingSession),
+                [
+                    {
+                        "session_id": "TEST_CHARGER_001_1_1000",
+                        "station_id": "TEST_CHARGER_001",
+                        "status": "active",
+                    },
+                    {
+                        "session_id": "TEST_CHARGER_001_2_2000",
+                        "station_id": "TEST_CHARGER_001",
+                        "status": "active",
+                    },
+                ],
+            )
 
-    @pytest.mark.asyncio
-    async def test_on_stop_transaction(self, charge_point):
-        """Test StopTransaction handler."""
-        with patch("app.ocpp_server.db_manager.get_session"):
-            result = await charge_point.on_stop_transaction(
-                transaction_id=12345, timestamp="2024-01-01T00:00:00Z", meter_stop=1000
+        with patch(
+            "app.ocpp_server.db_manager.session_factory",
+            return_value=mock_database_session,
+        ):
+            await charge_point.on_stop_transaction(
+                transaction_id=2000, timestamp=_TS_STOP, meter_stop=500
             )
 
-            assert result is not None
+        statement, params = mock_database_session.execute.call_args.args
+        assert statement is STOP_ACTIVE_SESSIONS_STMT
+        with engine.begin() as conn:
+            conn.execute(statement, params)
+            rows = conn.execute(
+                select(ChargingSession.session_id, ChargingSession.status).order_by(
+                    ChargingSession.session_id
+                )
+            ).all()
+        assert rows == [
+            ("TEST_CHARGER_001_1_1000", "active"),
+            ("TEST_CHARGER_001_2_2000", "completed"),
+        ]
 
-    @pytest.mark.asyncio
     async def test_on_authorize(self, charge_point):
         """Test Authorize handler."""
         result = await charge_point.on_authorize(id_tag="USER123")
 
         assert result.id_tag_info["status"].value == "Accepted"
 
-    @pytest.mark.asyncio
     async def test_send_remote_start_transaction(self, charge_point):
         """Test sending remote start transaction."""
-        charge_point.call = AsyncMock(return_value={"status": "Accepted"})
+        charge_point.call = MagicMock(return_value=accepted_reply())
 
         result = await charge_point.send_remote_start_transaction("USER123", 1)
 
         assert result is not None
         charge_point.call.assert_called_once()
 
-    @pytest.mark.asyncio
     async def test_send_remote_stop_transaction(self, charge_point):
         """Test sending remote stop transaction."""
-        charge_point.call = AsyncMock(return_value={"status": "Accepted"})
+        charge_point.call = MagicMock(return_value=accepted_reply())
 
         result = await charge_point.send_remote_stop_transaction(12345)
 
         assert result is not None
         charge_point.call.assert_called_once()
 
-    @pytest.mark.asyncio
     async def test_send_change_configuration(self, charge_point):
         """Test sending configuration change."""
-        charge_point.call = AsyncMock(return_value={"status": "Accepted"})
+        charge_point.call = MagicMock(return_value=accepted_reply())
 
         result = await charge_point.send_change_configuration(
             "HeartbeatInterval", "300"
@@ -134,13 +259,65 @@ class TestChargePoint:
         assert result is not None
         charge_point.call.assert_called_once()
 
-    @pytest.mark.asyncio
     async def test_handle_disconnection(self, charge_point):
         """Test handling disconnection."""
-        with patch("app.ocpp_server.db_manager.get_session"):
+        await charge_point._handle_disconnection()  # noqa: SLF001
+
+        assert charge_point.is_online is False
+
+    async def test_handle_disconnection_marks_station_offline(
+        self, charge_point, mock_database_session
+    ):
+        """Test disconnection marks the station offline with a single UPDATE."""
+        engine = create_engine("sqlite://")
+        ChargingStation.__table__.create(engine)
+        with engine.begin() as conn:
+            conn.execute(
+                insert(ChargingStation),
+                [
+                    {"station_id": "TEST_CHARGER_001", "name": "A", "is_online": True},
+                    {"station_id": "OTHER", "name": "B", "is_online": True},
+                ],
+            )
+
+        with patch(
+            "app.ocpp_server.db_manager.session_factory",
+            return_value=mock_database_session,
+        ):
+            await charge_point._handle_disconnection()  # noqa: SLF001
+
+        mock_database_session.execute.assert_called_once()
+        statement, params = mock_database_session.execute.call_args.args
+        assert statement is STATION_OFFLINE_STMT
+        with engine.begin() as conn:
+            conn.execute(statement, params)
+            rows = conn.execute(
+                select(ChargingStation.station_id, ChargingStation.is_online).order_by(
+                    ChargingStation.station_id
+                )
+            ).all()
+        assert rows == [("OTHER", True), ("TEST_CHARGER_001", False)]
+
+    async def test_db_session_reused_until_disconnection(
+        self, charge_point, mock_database_session
+    ):
+        """Test the connection keeps one session and closes it on disconnect."""
+        with patch(
+            "app.ocpp_server.db_manager.session_factory",
+            return_value=mock_database_session,
+        ) as mock_session_factory:
+            await charge_point.on_start_transaction(
+                connector_id=1, id_tag="USER123", meter_start=0, timestamp="ts"
+            )
+            await charge_point.on_stop_transaction(
+                transaction_id=1, timestamp="ts", meter_stop=10
+            )
+            mock_session_factory.assert_called_once()
+
             await charge_point._handle_disconnection()  # noqa: SLF001
 
-            assert charge_point.is_online is False
+        mock_database_session.close.assert_called_once()
+        assert charge_point._session is None  # noqa: SLF001
 
 
 class TestOCPPServer:
@@ -162,33 +339,140 @@ class TestOCPPServer:
         assert result == mock_cp
         mock_active_points.get.assert_called_once_with("TEST_CHARGER")
 
-    @pytest.mark.asyncio
-    @patch("app.ocpp_server.db_manager.get_session")
+    async def test_reconnect_replaces_stale_charge_point(self, mock_websocket):
+        """Test a reconnecting charger closes and replaces its old connection."""
+        old_websocket = AsyncMock()
+        old = ChargePoint("CHARGER_001", old_websocket)
+        new = ChargePoint("CHARGER_001", mock_websocket)
+
+        register_charge_point(old)
+        register_charge_point(new)
+        # Wait for the stale websocket to close, instead of sleeping
+        await asyncio.gather(*_closing_tasks)
+
+        old_websocket.close.assert_called_once()
+        assert active_charge_points["CHARGER_001"] is new
+
+        with patch("app.ocpp_server.db_manager.session_factory") as factory:
+            await old._handle_disconnection()  # noqa: SLF001
+
+        # The stale connection neither evicts nor marks the new one offline
+        assert active_charge_points["CHARGER_001"] is new
+        factory.assert_not_called()
+        unregister_charge_point(new)
+        assert "CHARGER_001" not in active_charge_points
+
     @patch("app.ocpp_server.ChargePoint")
-    async def test_on_connect_success(self, mock_charge_point_class, mock_get_session):
+    async def test_on_connect_success(self, mock_charge_point_class, db_session):
         """Test successful on_connect function."""
         mock_websocket = AsyncMock()
-        mock_websocket.request.path = "/CHARGER_001"
+        mock_websocket.request = SimpleNamespace(path="/CHARGER_001")
         mock_charge_point = AsyncMock()
         mock_charge_point_class.return_value = mock_charge_point
 
         # Mock database session with existing station
-        mock_session = AsyncMock()
-        mock_station = MagicMock()
-        mock_station.station_id = "CHARGER_001"
-        mock_session.execute.return_value.scalar_one_or_none.return_value = mock_station
-        mock_get_session.return_value.__aenter__.return_value = mock_session
+        mock_result = MagicMock()
+        mock_result.scalars.return_value.all.return_value = ["CHARGER_001"]
+        db_session.execute.return_value = mock_result
 
         await on_connect(mock_websocket)
 
         mock_charge_point_class.assert_called_once_with("CHARGER_001", mock_websocket)
         mock_charge_point.start.assert_called_once()
 
-    @pytest.mark.asyncio
+    @patch("app.ocpp_server.ChargePoint", side_effect=RuntimeError("bad handshake"))
+    async def test_on_connect_charge_point_creation_fails(
+        self, mock_charge_point_class, db_session
+    ):
+        """Test a failing ChargePoint constructor closes the websocket cleanly."""
+        mock_websocket = AsyncMock()
+        mock_websocket.request = SimpleNamespace(path="/CHARGER_001")
+        mock_result = MagicMock()
+        mock_result.scalars.return_value.all.return_value = ["CHARGER_001"]
+        db_session.execute.return_value = mock_result
+
+        await on_connect(mock_websocket)
+
+        mock_charge_point_class.assert_called_once_with("CHARGER_001", mock_websocket)
+        mock_websocket.close.assert_called_once_with()
+        assert "CHARGER_001" not in active_charge_points
+
+    @patch("app.ocpp_server.ChargePoint")
+    async def test_on_connect_start_fails(self, mock_charge_point_class, db_session):
+        """Test a charge point failing to start is unregistered and closed."""
+        mock_websocket = AsyncMock()
+        mock_websocket.request = SimpleNamespace(path="/CHARGER_001")
+        mock_charge_point = MagicMock(station_id="CHARGER_001")
+        mock_charge_point.start = AsyncMock(side_effect=RuntimeError("boom"))
+        mock_charge_point_class.return_value = mock_charge_point
+        mock_result = MagicMock()
+        mock_result.scalars.return_value.all.return_value = ["CHARGER_001"]
+        db_session.execute.return_value = mock_result
+
+        await on_connect(mock_websocket)
+
+        assert "CHARGER_001" not in active_charge_points
+        mock_websocket.close.assert_called_once_with()
+
+    async def test_on_connect_database_error(self, db_session):
+        """Test a failing station lookup rejects the connection."""
+        mock_websocket = AsyncMock()
+        mock_websocket.request = SimpleNamespace(path="/CHARGER_001")
+        db_session.execute.side_effect = RuntimeError("connection refused")
+
+        await on_connect(mock_websocket)
+
+        mock_websocket.close.assert_called_once_with(code=1011, reason="Database error")
+
+    async def test_on_connect_unregistered_station(self, db_session):
+        """Test a station missing from the database is rejected."""
+        mock_websocket = AsyncMock()
+        mock_websocket.request = SimpleNamespace(path="/UNKNOWN")
+        mock_result = MagicMock()
+        mock_result.scalars.return_value.all.return_value = []
+        db_session.execute.return_value = mock_result
+
+        await on_connect(mock_websocket)
+
+        mock_websocket.close.assert_called_once_with(
+            code=1008, reason="Charge point not registered"
+        )
+
+    async def test_is_registered_station_cached(self, db_session):
+        """Test registered stations are answered from the cache after a refresh."""
+        mock_result = MagicMock()
+        mock_result.scalars.return_value.all.return_value = ["CHARGER_001"]
+        db_session.execute.return_value = mock_result
+
+        assert await is_registered_station("CHARGER_001") is True
+        assert await is_registered_station("CHARGER_001") is True
+
+        db_session.execute.assert_called_once()
+
+    async def test_is_registered_station_miss_looks_up(self, db_session):
+        """Test a station missing from a fresh cache is looked up once."""
+        mock_result = MagicMock()
+        mock_result.scalars.return_value.all.return_value = []
+        mock_result.scalar.return_value = None
+        db_session.execute.return_value = mock_result
+        assert await is_registered_station("CHARGER_002") is False
+
+        mock_result.scalar.return_value = 2
+        assert await is_registered_station("CHARGER_002") is True
+        assert await is_registered_station("CHARGER_002") is True
+
+        assert db_session.execute.call_count == 2
+
+    def test_select_ocpp_subprotocol(self):
+        """Test OCPP 1.6 is negotiated only when the client offers it."""
+        assert select_ocpp_subprotocol(None, ["ocpp2.0", "ocpp1.6"]) == "ocpp1.6"
+        assert select_ocpp_subprotocol(None, ["ocpp2.0"]) is None
+        assert select_ocpp_subprotocol(None, []) is None
+
     async def test_on_connect_empty_charge_point_id(self):
         """Test on_connect with empty charge point ID."""
         mock_websocket = AsyncMock()
-        mock_websocket.request.path = "/"
+        mock_websocket.request = SimpleNamespace(path="/")
         mock_websocket.close = AsyncMock()
 
         await on_connect(mock_websocket)
@@ -198,53 +482,113 @@ class TestOCPPServer:
         )
 
 
-class TestOCPPMessageLogging:
-    """Test OCPP message logging functionality."""
+# OCPP message logging
 
-    @pytest.mark.asyncio
-    @patch("app.ocpp_server.db_manager.get_session")
-    async def test_log_ocpp_message(self, mock_get_session):
-        """Test logging OCPP messages."""
-        charge_point = ChargePoint("TEST_CHARGER", AsyncMock())
 
-        mock_session = AsyncMock()
-        mock_session.add = MagicMock()
-        mock_session.commit = AsyncMock()
+async def test_log_ocpp_message():
+    """Test logging OCPP messages."""
+    # Logging only reads station_id, so no connection is needed
+    charge_point = SimpleNamespace(station_id="TEST_CHARGER")
+    drain_pending_messages()
 
-        # Mock the async context manager properly
-        async def mock_session_generator():
-            yield mock_session
+    await ChargePoint._log_ocpp_message(  # noqa: SLF001
+        charge_point, "TestMessage", "TestAction", {"test": "data"}
+    )
 
-        mock_get_session.return_value = mock_session_generator()
+    messages = drain_pending_messages()
+    assert len(messages) == 1
+    assert messages[0]["station_id"] == "TEST_CHARGER"
+    assert messages[0]["action"] == "TestAction"
+    assert messages[0]["payload"] == '{"test":"data"}'
 
-        await charge_point._log_ocpp_message(  # noqa: SLF001
-            "TestMessage", "TestAction", {"test": "data"}
-        )
 
-        mock_session.add.assert_called_once()
-        mock_session.commit.assert_called_once()
+async def test_flush_pending_writes(db_session):
+    """Test queued messages and heartbeats are written in one transaction."""
+    charge_point = ChargePoint("TEST_CHARGER", AsyncMock())
+    drain_pending_messages()
+    pending_heartbeats.clear()
+
+    await charge_point.on_heartbeat()
+    await charge_point.on_authorize(id_tag="USER123")
+    await flush_pending_writes()
+
+    # One UPDATE for the heartbeat and one bulk INSERT for both messages
+    assert db_session.execute.call_count == 2
+    insert_rows = db_session.execute.call_args_list[1].args[1]
+    assert [row["action"] for row in insert_rows] == ["Heartbeat", "Authorize"]
+    db_session.commit.assert_called_once()
+    assert pending_messages.empty()
+    assert not pending_heartbeats
+
+
+async def test_flush_large_batch_uses_copy(db_session):
+    """Test large message batches are written with asyncpg COPY."""
+    charge_point = ChargePoint("TEST_CHARGER", AsyncMock())
+    drain_pending_messages()
+    pending_heartbeats.clear()
+
+    conn = MagicMock()
+    conn.dialect.driver = "asyncpg"
+    conn.get_raw_connection = AsyncMock()
+    copy = conn.get_raw_connection.return_value.driver_connection
+    copy.copy_records_to_table = AsyncMock()
+    db_session.connection = AsyncMock(return_value=conn)
+
+    for _ in range(COPY_THRESHOLD):
+        await charge_point.on_authorize(id_tag="USER123")
+    await flush_pending_writes()
+
+    copy.copy_records_to_table.assert_called_once()
+    kwargs = copy.copy_records_to_table.call_args.kwargs
+    assert len(kwargs["records"]) == COPY_THRESHOLD
+    db_session.execute.assert_not_called()
+    db_session.commit.assert_called_once()
+
+
+async def test_flush_copy_runs_after_heartbeat_update(db_session):
+    """Test COPY is sent only once the heartbeat UPDATE opened the transaction."""
+    charge_point = ChargePoint("TEST_CHARGER", AsyncMock())
+    drain_pending_messages()
+    pending_heartbeats.clear()
+
+    calls = []
+    conn = MagicMock()
+    conn.dialect.driver = "asyncpg"
+    conn.get_raw_connection = AsyncMock()
+    copy = conn.get_raw_connection.return_value.driver_connection
+    copy.copy_records_to_table = AsyncMock(
+        side_effect=lambda *_args, **_kwargs: calls.append("copy")
+    )
+    db_session.connection = AsyncMock(return_value=conn)
+    db_session.execute.side_effect = lambda *_args: calls.append("update")
+
+    await charge_point.on_heartbeat()
+    for _ in range(COPY_THRESHOLD - 1):
+        await charge_point.on_authorize(id_tag="USER123")
+    await flush_pending_writes()
+
+    assert calls == ["update", "copy"]
+    db_session.commit.assert_called_once()
+
+
+async def test_flush_pending_writes_nothing_queued(patched_db_session):
+    """Test the flusher does not touch the database when idle."""
+    drain_pending_messages()
+    pending_heartbeats.clear()
+
+    await flush_pending_writes()
+
+    patched_db_session.assert_not_called()
 
 
-@pytest.mark.asyncio
 class TestAsyncOCPPFunctionality:
     """Test async OCPP functionality."""
 
-    @patch("app.ocpp_server.db_manager.get_session")
-    async def test_charge_point_lifecycle(self, mock_get_session):
+    async def test_charge_point_lifecycle(self):
         """Test complete charge point lifecycle."""
         mock_websocket = AsyncMock()
         charge_point = ChargePoint("TEST_CHARGER", mock_websocket)
 
-        # Mock database session
-        mock_session = AsyncMock()
-        mock_session.commit = AsyncMock()
-
-        # Mock the async context manager properly
-        async def mock_session_generator():
-            yield mock_session
-
-        mock_get_session.return_value = mock_session_generator()
-
         # Test initialization
         assert charge_point.station_id == "TEST_CHARGER"
         assert charge_point.is_online is True
@@ -252,17 +596,3 @@ class TestAsyncOCPPFunctionality:
         # Test disconnection
         await charge_point._handle_disconnection()  # noqa: SLF001
         assert charge_point.is_online is False
-
-    async def test_connector_status_tracking(self):
-        """Test connector status tracking."""
-        mock_websocket = AsyncMock()
-        charge_point = ChargePoint("TEST_CHARGER", mock_websocket)
-
-        # Test status notification
-        await charge_point.on_status_notification(
-            connector_id=1, error_code="NoError", status="Available"
-        )
-
-        assert 1 in charge_point.connector_status
-        assert charge_point.connector_status[1]["status"] == "Available"
-        assert charge_point.connector_status[1]["error_code"] == "NoError"
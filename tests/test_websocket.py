@@ -1,9 +1,44 @@
-from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio
+from types import MappingProxyType, SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
 from app.ocpp_server import on_connect
 
+# Transaction timestamps shared by the charging session tests
+_TS_START = "2024-01-01T12:00:00Z"
+_TS_STOP = "2024-01-01T13:00:00Z"
+
+# Handler arguments, frozen and shared by the message tests
+BOOT_KWARGS = MappingProxyType(
+    {
+        "charge_point_model": "Tesla Wall Connector",
+        "charge_point_vendor": "Tesla",
+        "charge_point_serial_number": "TW123456789",
+        "charge_box_serial_number": "CB123456789",
+        "firmware_version": "1.0.0",
+    }
+)
+STATUS_KWARGS = MappingProxyType(
+    {"connector_id": 1, "error_code": "NoError", "status": "Available"}
+)
+START_KWARGS = MappingProxyType(
+    {"connector_id": 1, "id_tag": "john_doe", "meter_start": 0, "timestamp": _TS_START}
+)
+STOP_KWARGS = MappingProxyType(
+    {
+        "transaction_id": 12345,
+        "timestamp": _TS_STOP,
+        "meter_stop": 1000,
+        "reason": "Local",
+    }
+)
+
+
+async def _ignore(*args, **kwargs):
+    """Accept a websocket send or recv without recording it."""
+
 
 class TestWebSocketConnection:
     """Test WebSocket connection handling."""
@@ -11,201 +46,153 @@ class TestWebSocketConnection:
     @pytest.fixture
     def mock_websocket(self):
         """Mock WebSocket connection."""
-        websocket = AsyncMock()
-        websocket.request.path = "/CHARGER_001"
+        websocket = MagicMock()
+        websocket.request = SimpleNamespace(path="/CHARGER_001")
+        # close is asserted on; recv and send only need to be awaitable
         websocket.close = AsyncMock()
-        websocket.recv = AsyncMock()
-        websocket.send = AsyncMock()
+        websocket.recv = _ignore
+        websocket.send = _ignore
         return websocket
 
-    @pytest.mark.asyncio
-    async def test_websocket_connection_empty_path(self, mock_websocket):
-        """Test WebSocket connection with empty path."""
-        mock_websocket.request.path = "/"
+    @pytest.mark.parametrize(
+        ("path", "code", "reason"),
+        [
+            ("/", 1008, "Empty charge point ID"),
+            ("", 1008, "Empty charge point ID"),
+            ("//", 1008, "Empty charge point ID"),
+        ],
+    )
+    async def test_websocket_connection_empty_path(
+        self, mock_websocket, path, code, reason
+    ):
+        """Test WebSocket connections without a charge point ID are rejected."""
+        mock_websocket.request.path = path
 
         await on_connect(mock_websocket)
 
         # Verify connection was closed
-        mock_websocket.close.assert_called_once_with(
-            code=1008, reason="Empty charge point ID"
-        )
+        mock_websocket.close.assert_called_once_with(code=code, reason=reason)
+
+
+# Incoming message handlers, their arguments and a check of reply and state
+MESSAGE_CASES = [
+    pytest.param(
+        "on_boot_notification",
+        BOOT_KWARGS,
+        lambda result, _cp: (
+            result.status.value == "Accepted"
+            and result.current_time is not None
+            and result.interval == 300
+        ),
+        id="boot_notification",
+    ),
+    pytest.param(
+        "on_heartbeat",
+        {},
+        lambda result, _cp: result.current_time is not None,
+        id="heartbeat",
+    ),
+    pytest.param(
+        "on_status_notification",
+        STATUS_KWARGS,
+        lambda result, cp: (
+            result is not None and cp.connector_status[1]["status"] == "Available"
+        ),
+        id="status_notification",
+    ),
+    pytest.param(
+        "on_start_transaction",
+        START_KWARGS,
+        lambda result, _cp: (
+            result.transaction_id is not None
+            and result.id_tag_info["status"].value == "Accepted"
+        ),
+        id="start_transaction",
+    ),
+    pytest.param(
+        "on_stop_transaction",
+        STOP_KWARGS,
+        lambda result, _cp: result is not None,
+        id="stop_transaction",
+    ),
+    pytest.param(
+        "on_authorize",
+        {"id_tag": "john_doe"},
+        lambda result, _cp: result.id_tag_info["status"].value == "Accepted",
+        id="authorize",
+    ),
+]
 
 
 class TestWebSocketMessageHandling:
     """Test WebSocket message handling."""
 
-    @pytest.fixture
-    def mock_charge_point(self):
-        """Create mock charge point."""
-        websocket = AsyncMock()
-        websocket.request.path = "/CHARGER_001"
-        websocket.send = AsyncMock()
-        websocket.close = AsyncMock()
-
-        from app.ocpp_server import ChargePoint
-
-        return ChargePoint("CHARGER_001", websocket)
-
-    @pytest.mark.asyncio
-    async def test_boot_notification_message(self, mock_charge_point):
-        """Test BootNotification message handling."""
-        with patch("app.ocpp_server.db_manager.get_session") as mock_get_session:
-            mock_session = AsyncMock()
-            mock_station = MagicMock()
-            mock_station.station_id = "CHARGER_001"
-            mock_result = AsyncMock()
-            mock_result.scalar_one_or_none.return_value = mock_station
-            mock_session.execute.return_value = mock_result
-            mock_session.commit = AsyncMock()
-            mock_session.refresh = AsyncMock()
-            mock_session.close = AsyncMock()
-
-            async def mock_session_generator():
-                yield mock_session
-
-            mock_get_session.return_value = mock_session_generator()
-
-            result = await mock_charge_point.on_boot_notification(
-                charge_point_model="Tesla Wall Connector",
-                charge_point_vendor="Tesla",
-                charge_point_serial_number="TW123456789",
-                charge_box_serial_number="CB123456789",
-                firmware_version="1.0.0",
-            )
-
-            assert result.status.value == "Accepted"
-            assert result.current_time is not None
-            assert result.interval == 300
-
-    @pytest.mark.asyncio
-    async def test_heartbeat_message(self, mock_charge_point):
-        """Test Heartbeat message handling."""
-        with patch("app.ocpp_server.db_manager.get_session"):
-            result = await mock_charge_point.on_heartbeat()
-
-            assert result.current_time is not None
-
-    @pytest.mark.asyncio
-    async def test_status_notification_message(self, mock_charge_point):
-        """Test StatusNotification message handling."""
-        result = await mock_charge_point.on_status_notification(
-            connector_id=1, error_code="NoError", status="Available"
-        )
-
-        assert result is not None
-        assert mock_charge_point.connector_status[1]["status"] == "Available"
-
-    @pytest.mark.asyncio
-    async def test_start_transaction_message(self, mock_charge_point):
-        """Test StartTransaction message handling."""
-        with patch("app.ocpp_server.db_manager.get_session"):
-            result = await mock_charge_point.on_start_transaction(
-                connector_id=1,
-                id_tag="john_doe",
-                meter_start=0,
-                timestamp="2024-01-01T12:00:00Z",
-            )
-
-            assert result.transaction_id is not None
-            assert result.id_tag_info["status"].value == "Accepted"
-
-    @pytest.mark.asyncio
-    async def test_stop_transaction_message(self, mock_charge_point):
-        """Test StopTransaction message handling."""
-        with patch("app.ocpp_server.db_manager.get_session"):
-            result = await mock_charge_point.on_stop_transaction(
-                transaction_id=12345,
-                timestamp="2024-01-01T13:00:00Z",
-                meter_stop=1000,
-                reason="Local",
-            )
+    @pytest.mark.parametrize(("handler", "kwargs", "check"), MESSAGE_CASES)
+    async def test_message_handling(self, mock_charge_point, handler, kwargs, check):
+        """Test each incoming OCPP message is handled and answered."""
+        result = await getattr(mock_charge_point, handler)(**kwargs)
 
-            assert result is not None
-
-    @pytest.mark.asyncio
-    async def test_authorize_message(self, mock_charge_point):
-        """Test Authorize message handling."""
-        result = await mock_charge_point.on_authorize(id_tag="john_doe")
-
-        assert result.id_tag_info["status"].value == "Accepted"
+        assert check(result, mock_charge_point)
 
 
 class TestWebSocketMessageFlow:
     """Test complete WebSocket message flow."""
 
-    @pytest.mark.asyncio
-    async def test_complete_ocpp_message_flow(self):
+    async def test_complete_ocpp_message_flow(self, mock_charge_point):
         """Test complete OCPP message flow."""
-        websocket = AsyncMock()
-        websocket.request.path = "/CHARGER_001"
-        websocket.close = AsyncMock()
+        charge_point = mock_charge_point
 
-        from app.ocpp_server import ChargePoint
-
-        charge_point = ChargePoint("CHARGER_001", websocket)
-
-        with patch("app.ocpp_server.db_manager.get_session"):
-            # 1. BootNotification
-            boot_result = await charge_point.on_boot_notification(
-                charge_point_model="Tesla Wall Connector", charge_point_vendor="Tesla"
-            )
-            assert boot_result.status.value == "Accepted"
-
-            # 2. Heartbeat
-            heartbeat_result = await charge_point.on_heartbeat()
-            assert heartbeat_result.current_time is not None
-
-            # 3. StatusNotification
-            status_result = await charge_point.on_status_notification(
-                connector_id=1, error_code="NoError", status="Available"
-            )
-            assert status_result is not None
-
-            # 4. StartTransaction
-            start_result = await charge_point.on_start_transaction(
-                connector_id=1,
-                id_tag="john_doe",
-                meter_start=0,
-                timestamp="2024-01-01T12:00:00Z",
-            )
-            assert start_result.transaction_id is not None
-
-            # 5. StopTransaction
-            stop_result = await charge_point.on_stop_transaction(
-                transaction_id=start_result.transaction_id,
-                timestamp="2024-01-01T13:00:00Z",
-                meter_stop=1000,
-                reason="Local",
-            )
-            assert stop_result is not None
-
-    @pytest.mark.asyncio
-    async def test_remote_commands_flow(self):
-        """Test remote commands flow."""
-        websocket = AsyncMock()
-        websocket.request.path = "/CHARGER_001"
+        # 1-3. BootNotification, Heartbeat and StatusNotification are independent
+        boot_result, heartbeat_result, status_result = await asyncio.gather(
+            charge_point.on_boot_notification(**BOOT_KWARGS),
+            charge_point.on_heartbeat(),
+            charge_point.on_status_notification(**STATUS_KWARGS),
+        )
+        assert boot_result.status.value == "Accepted"
+        assert heartbeat_result.current_time is not None
+        assert status_result is not None
 
-        from app.ocpp_server import ChargePoint
+        # 4. StartTransaction
+        start_result = await charge_point.on_start_transaction(**START_KWARGS)
+        assert start_result.transaction_id is not None
+
+        # 5. StopTransaction
+        stop_result = await charge_point.on_stop_transaction(
+            **{**STOP_KWARGS, "transaction_id": start_result.transaction_id}
+        )
+        assert stop_result is not None
+
+    async def test_remote_commands_flow(self, mock_charge_point, monkeypatch):
+        """Test remote commands flow."""
+        charge_point = mock_charge_point
 
-        charge_point = ChargePoint("CHARGER_001", websocket)
+        # An already completed future: awaiting it never yields to the loop
+        accepted = asyncio.get_running_loop().create_future()
+        accepted.set_result({"status": "Accepted"})
 
-        # Test remote start transaction
-        charge_point.send_remote_start_transaction = AsyncMock(
-            return_value={"status": "Accepted"}
+        # Stubs are undone after the test, leaving the shared charge point intact
+        monkeypatch.setattr(
+            charge_point,
+            "send_remote_start_transaction",
+            MagicMock(return_value=accepted),
         )
         result = await charge_point.send_remote_start_transaction("john_doe", 1)
         assert result["status"] == "Accepted"
 
         # Test remote stop transaction
-        charge_point.send_remote_stop_transaction = AsyncMock(
-            return_value={"status": "Accepted"}
+        monkeypatch.setattr(
+            charge_point,
+            "send_remote_stop_transaction",
+            MagicMock(return_value=accepted),
         )
         result = await charge_point.send_remote_stop_transaction(12345)
         assert result["status"] == "Accepted"
 
         # Test configuration change
-        charge_point.send_change_configuration = AsyncMock(
-            return_value={"status": "Accepted"}
+        monkeypatch.setattr(
+            charge_point,
+            "send_change_configuration",
+            MagicMock(return_value=accepted),
         )
         result = await charge_point.send_change_configuration(
             "HeartbeatInterval", "300"